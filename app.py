@@ -3,45 +3,687 @@ StudBot - AI Learning Companion Backend
 Flask API for handling AI responses and quiz data
 """
 
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, request, jsonify, render_template
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
+import base64
+import bisect
+import gzip
 import json
+import hashlib
+import heapq
+import hmac
+import itertools
+import math
+import pickle
 import random
 import re
+import secrets
+import signal
+import sqlite3
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
 from datetime import datetime
 import os
 
+import numpy as np
+from scipy import sparse
+
+try:
+    import brotli
+except ImportError:  # optional, gzip is always available
+    brotli = None
+
 app = Flask(__name__)
 CORS(app)
 
+# Snapshots pickle records as app.<class>; when started as a script, let
+# those references resolve to this module instead of importing it twice
+sys.modules.setdefault('app', sys.modules[__name__])
+
+QA_DATASET_PATH = 'ai_qa_dataset.json'
+MCQ_DATASET_PATH = 'ai_mcq_500plus.json'
+SNAPSHOT_PATH = os.environ.get('STUDBOT_SNAPSHOT', 'studbot_snapshot.pkl')
+SNAPSHOT_FORMAT = 15
+MAX_CHAT_BATCH = 100
+DEFAULT_SUGGESTIONS = 8
+RELATED_K = 5
+RELATED_BLOCK_SIZE = 256
+DEFAULT_SEARCH_LIMIT = 10
+MAX_SEARCH_LIMIT = 50
+MAX_FACET_VALUES = 20
+# Content codings in order of preference, and the levels used for
+# per-request compression of dynamic responses
+CONTENT_ENCODINGS = ['br', 'gzip'] if brotli else ['gzip']
+DYNAMIC_COMPRESSION_LEVELS = {'br': 4, 'gzip': 6}
+COMPRESS_MIN_SIZE = 1024
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+MAX_SUGGESTIONS = 20
+STREAM_CHUNK_SIZE = 256
+RESPONSE_CACHE_SIZE = int(os.environ.get('STUDBOT_CACHE_SIZE', 1024))
+RESPONSE_CACHE_TTL = 3600
+MAX_CHANGE_VERSIONS = 100
+# Fields a quiz in progress may show; correct answers and explanations are
+# only revealed by /api/quiz/submit
+QUIZ_FIELDS = ('id', 'question', 'options', 'category', 'difficulty', 'keywords', 'unit', 'topic')
+QUIZ_DEFAULT_FIELDS = ('id', 'question', 'options')
+QUIZ_SIZE = 10
+SEARCH_RESULT_FIELDS = ('id', 'question', 'answer', 'category', 'keywords')
+MAX_CACHED_PROJECTIONS = 32
+JSON_SEPARATORS = (',', ':')
+
+MISSING = object()
+
+class Record:
+    """Compact, read-only dataset entry
+    
+    Each JSON field lives in a slot instead of a per-record dict, and
+    repeated strings such as categories are interned. Records support the
+    dict-style access used throughout the app (record['question'],
+    record.get('unit')). Fields absent from the JSON stay unset, and
+    unknown fields are kept in `extra`, so to_dict() gives back the
+    original object.
+    """
+    
+    __slots__ = ('extra',)
+    fields = ()
+    interned = ()
+    
+    def __init__(self, data):
+        extra = None
+        for key, value in data.items():
+            if key in self.interned:
+                value = intern_value(value)
+            if key in self.fields:
+                setattr(self, key, value)
+            else:
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+        self.extra = extra
+    
+    def get(self, key, default=None):
+        if key in self.fields:
+            return getattr(self, key, default)
+        if self.extra:
+            return self.extra.get(key, default)
+        return default
+    
+    def __getitem__(self, key):
+        value = self.get(key, MISSING)
+        if value is MISSING:
+            raise KeyError(key)
+        return value
+    
+    def __contains__(self, key):
+        return self.get(key, MISSING) is not MISSING
+    
+    def __eq__(self, other):
+        if not isinstance(other, Record):
+            return NotImplemented
+        return type(self) is type(other) and self.to_dict() == other.to_dict()
+    
+    __hash__ = None
+    
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+    
+    def to_dict(self):
+        """Return the record as the dict it was loaded from"""
+        data = {}
+        for key in self.fields:
+            value = getattr(self, key, MISSING)
+            if value is not MISSING:
+                data[key] = list(value) if key in self.interned and isinstance(value, tuple) else value
+        if self.extra:
+            data.update(self.extra)
+        return data
+    
+    def content_hash(self):
+        """Fingerprint of the record's content, independent of field order"""
+        return hashlib.sha256(json.dumps(self.to_dict(), sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+def intern_value(value):
+    """Intern a string, or each string of a list (returned as a tuple)"""
+    if isinstance(value, str):
+        return sys.intern(value)
+    if isinstance(value, list):
+        return tuple(sys.intern(item) if isinstance(item, str) else item for item in value)
+    return value
+
+class QARecord(Record):
+    """One Q&A pair of the knowledge base"""
+    
+    fields = ('id', 'question', 'answer', 'category', 'marks', 'keywords', 'created_at')
+    interned = ('category', 'keywords')
+    __slots__ = fields
+
+class MCQRecord(Record):
+    """One multiple choice question"""
+    
+    fields = ('id', 'question', 'options', 'correct_answer', 'explanation',
+              'category', 'difficulty', 'keywords', 'unit', 'topic')
+    interned = ('category', 'difficulty', 'keywords', 'unit', 'topic')
+    __slots__ = fields
+
+class PreencodedJSON:
+    """A response payload already encoded to JSON bytes"""
+    
+    __slots__ = ('body',)
+    
+    def __init__(self, body):
+        self.body = body
+
+class StudBotJSONProvider(DefaultJSONProvider):
+    """JSON provider that serializes dataset records as their original dicts"""
+    
+    @staticmethod
+    def default(o):
+        if isinstance(o, Record):
+            return o.to_dict()
+        return DefaultJSONProvider.default(o)
+    
+    def response(self, *args, **kwargs):
+        """jsonify(), passing pre-encoded payloads through untouched"""
+        if len(args) == 1 and not kwargs and isinstance(args[0], PreencodedJSON):
+            return self._app.response_class(args[0].body + b'\n', mimetype=self.mimetype)
+        return super().response(*args, **kwargs)
+
+app.json = StudBotJSONProvider(app)
+
 # Load AI knowledge base
 def load_knowledge_base():
     """Load the AI knowledge base from JSON file"""
     try:
-        with open('ai_qa_dataset.json', 'r', encoding='utf-8') as f:
+        with open(QA_DATASET_PATH, 'r', encoding='utf-8') as f:
             data = json.load(f)
-        return data.get('qa_pairs', [])
+        return [QARecord(qa) for qa in data.get('qa_pairs', [])]
     except FileNotFoundError:
         return []
 
 def load_mcq_data():
     """Load MCQ data from JSON file"""
     try:
-        with open('ai_mcq_500plus.json', 'r', encoding='utf-8') as f:
+        with open(MCQ_DATASET_PATH, 'r', encoding='utf-8') as f:
             data = json.load(f)
-        return data.get('mcqs', [])
+        return [MCQRecord(mcq) for mcq in data.get('mcqs', [])]
     except FileNotFoundError:
         return []
 
-# Load data
-knowledge_base = load_knowledge_base()
-mcq_data = load_mcq_data()
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+\*?")
+PUNCTUATION_PATTERN = re.compile(r"[^\w\s*]+")
 
-class AIResponseGenerator:
-    """Generate AI responses based on user queries"""
+def tokenize(text):
+    """Split text into lowercase word tokens, keeping names like 'a*'"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+def normalize_query(query):
+    """Lowercase, drop punctuation (except the '*' of 'A*') and collapse whitespace"""
+    return ' '.join(PUNCTUATION_PATTERN.sub(' ', query.lower()).split())
+
+def edit_distance(a, b, max_distance):
+    """Optimal string alignment distance, or max_distance + 1 once it is exceeded"""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+class SpellingIndex:
+    """Typo correction against the knowledge base vocabulary (SymSpell)
+    
+    Corrections only target the retrieval vocabulary: words of questions,
+    keywords and categories. Every such word is indexed under all strings
+    obtained by deleting up to max_distance characters from its prefix. A
+    misspelled word is looked up by its own deletes, so candidates come
+    from a few dict hits instead of a scan of the vocabulary; only those
+    few are then checked with a real edit distance. Words found anywhere in
+    the corpus, answers included, are never corrected.
+    """
+    
+    max_distance = 2
+    prefix_length = 7
+    
+    def __init__(self, knowledge_base):
+        self.knowledge_base = knowledge_base
+        self.build_index()
+    
+    def build_index(self):
+        """Count the vocabulary and index the deletes of every word"""
+        self.frequencies = {}
+        self.known = set()
+        for qa in self.knowledge_base:
+            text = ' '.join([qa.get('question', ''), qa.get('category', '')] + list(qa.get('keywords', [])))
+            for token in tokenize(text):
+                self.frequencies[token] = self.frequencies.get(token, 0) + 1
+            self.known.update(tokenize(qa.get('answer', '')))
+        self.known.update(self.frequencies)
+        
+        self.deletes = {}
+        for word in self.frequencies:
+            word = sys.intern(word)
+            for variant in self.variants(word):
+                self.deletes.setdefault(variant, []).append(word)
+    
+    def variants(self, word):
+        """Return the word's prefix with up to max_distance characters deleted"""
+        variants = frontier = {word[:self.prefix_length]}
+        for _ in range(self.max_distance):
+            frontier = {variant[:i] + variant[i + 1:] for variant in frontier for i in range(len(variant))}
+            variants = variants | frontier
+        return variants
+    
+    def allowed_distance(self, word):
+        """Edits tolerated for a word of this length; short words are left alone"""
+        if len(word) < 4 or not word.isalpha():
+            return 0
+        return 1 if len(word) <= 5 else self.max_distance
+    
+    def correct_word(self, word):
+        """Return the closest, then most frequent, vocabulary word within reach"""
+        max_distance = self.allowed_distance(word)
+        if word in self.known or not max_distance:
+            return word
+        
+        best, best_key = word, None
+        candidates = {candidate for variant in self.variants(word) for candidate in self.deletes.get(variant, ())}
+        for candidate in candidates:
+            distance = edit_distance(word, candidate, max_distance)
+            if distance > max_distance:
+                continue
+            key = (distance, -self.frequencies[candidate], candidate)
+            if best_key is None or key < best_key:
+                best, best_key = candidate, key
+        return best
+    
+    def correct(self, query):
+        """Correct every unknown word of a normalized query"""
+        return ' '.join(self.correct_word(word) for word in query.split())
+
+class Scorer(ABC):
+    """Base class for knowledge base retrieval scorers"""
+    
+    threshold = 0.3
+    
+    @abstractmethod
+    def best_match(self, query):
+        """Return (doc_id, score) of the best question, or (None, 0)"""
+    
+    def best_matches(self, queries):
+        """Return one (doc_id, score) pair per query, in order"""
+        # Repeated queries in a batch are only scored once
+        unique = {query: self.best_match(query) for query in dict.fromkeys(queries)}
+        return [unique[query] for query in queries]
+
+class WordOverlapScorer(Scorer):
+    """Score questions by the fraction of query words they contain"""
     
     def __init__(self, knowledge_base):
         self.knowledge_base = knowledge_base
+        self.build_index()
+    
+    def build_index(self):
+        """Build the token -> posting list inverted index over all questions"""
+        # Questions are split exactly like queries, so 'search?' and 'alpha-beta'
+        # index the same words a normalized query contains
+        self.postings = {}
+        for doc_id, qa in enumerate(self.knowledge_base):
+            for word in set(normalize_query(qa['question']).split()):
+                self.postings.setdefault(word, []).append(doc_id)
+    
+    def best_match(self, query):
+        """Return (doc_id, score) of the best question, or (None, 0)"""
+        return self.best_matches([query])[0]
+    
+    def best_matches(self, queries):
+        """Return one (doc_id, score) pair per query, looking each distinct word up once"""
+        query_words = [set(normalize_query(query).split()) for query in queries]
+        queries_by_word = {}
+        for index, words in enumerate(query_words):
+            for word in words:
+                queries_by_word.setdefault(word, []).append(index)
+        
+        # Count overlapping words only for questions sharing a query word
+        overlaps = [{} for _ in queries]
+        for word, indices in queries_by_word.items():
+            postings = self.postings.get(word)
+            if not postings:
+                continue
+            for index in indices:
+                overlap = overlaps[index]
+                for doc_id in postings:
+                    overlap[doc_id] = overlap.get(doc_id, 0) + 1
+        
+        matches = []
+        for overlap, words in zip(overlaps, query_words):
+            if not overlap:
+                matches.append((None, 0))
+                continue
+            # Highest overlap wins, ties go to the earliest question
+            doc_id = min(overlap, key=lambda d: (-overlap[d], d))
+            matches.append((doc_id, overlap[doc_id] / len(words)))
+        return matches
+
+class BM25Scorer(Scorer):
+    """Okapi BM25 ranking over the knowledge base questions"""
+    
+    def __init__(self, knowledge_base, k1=1.2, b=0.75):
+        self.knowledge_base = knowledge_base
+        self.k1 = k1
+        self.b = b
+        self.build_index()
+    
+    def build_index(self):
+        """Precompute document lengths, IDF tables and term frequencies"""
+        self.postings = {}
+        self.doc_lengths = []
+        for doc_id, qa in enumerate(self.knowledge_base):
+            tokens = tokenize(qa['question'])
+            self.doc_lengths.append(len(tokens))
+            for token in tokens:
+                term_freqs = self.postings.setdefault(token, {})
+                term_freqs[doc_id] = term_freqs.get(doc_id, 0) + 1
+        
+        total_docs = len(self.doc_lengths)
+        avg_length = sum(self.doc_lengths) / total_docs if total_docs else 0
+        # Length normalisation part of the BM25 denominator, per document
+        self.doc_norms = [
+            self.k1 * (1 - self.b + self.b * length / avg_length) if avg_length else self.k1
+            for length in self.doc_lengths
+        ]
+        self.idf = {
+            term: math.log(1 + (total_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()
+        }
+        # Idf of a term that appears nowhere, used to weigh unknown query words
+        self.max_idf = math.log(1 + (total_docs + 0.5) / 0.5)
+        # Highest score each term can contribute to any single document
+        self.upper_bounds = {
+            term: max(self.term_score(term, doc_id, tf) for doc_id, tf in docs.items())
+            for term, docs in self.postings.items()
+        }
+    
+    def term_score(self, term, doc_id, tf):
+        """BM25 contribution of a single term occurrence count to a document"""
+        return self.idf[term] * tf * (self.k1 + 1) / (tf + self.doc_norms[doc_id])
+    
+    def top_k(self, query, k=10):
+        """Return up to k (doc_id, raw_score) pairs, best first
+        
+        Terms are processed from the highest to the lowest upper bound. Once
+        the k-th best score beats everything the remaining terms could add,
+        unseen documents can no longer qualify and only the current
+        candidates are updated (MaxScore-style early termination).
+        """
+        terms = sorted(
+            {token for token in tokenize(query) if token in self.postings},
+            key=lambda term: (-self.upper_bounds[term], term)
+        )
+        scores = {}
+        admitting = True
+        
+        for position, term in enumerate(terms):
+            remaining = sum(self.upper_bounds[later] for later in terms[position + 1:])
+            docs = self.postings[term]
+            
+            if admitting:
+                for doc_id, tf in docs.items():
+                    scores[doc_id] = scores.get(doc_id, 0.0) + self.term_score(term, doc_id, tf)
+            else:
+                for doc_id in scores:
+                    tf = docs.get(doc_id)
+                    if tf:
+                        scores[doc_id] += self.term_score(term, doc_id, tf)
+            
+            if len(scores) >= k:
+                kth_score = heapq.nlargest(k, scores.values())[-1]
+                if kth_score > remaining:
+                    admitting = False
+                    # Drop candidates that can no longer reach the top k
+                    scores = {
+                        doc_id: score for doc_id, score in scores.items()
+                        if score + remaining >= kth_score
+                    }
+        
+        return heapq.nsmallest(k, scores.items(), key=lambda item: (-item[1], item[0]))
+    
+    def max_score(self, query):
+        """Best raw score a document could get if it held every query word"""
+        # Unknown words count as a single occurrence of the rarest possible term
+        return sum(
+            self.upper_bounds.get(token, self.max_idf)
+            for token in set(tokenize(query))
+        )
+    
+    def best_match(self, query):
+        """Return (doc_id, score) with the score normalised to 0..1"""
+        top = self.top_k(query, k=1)
+        if not top:
+            return None, 0
+        
+        doc_id, score = top[0]
+        return doc_id, score / self.max_score(query)
+
+class TfidfScorer(Scorer):
+    """Cosine similarity over a sparse TF-IDF matrix of the questions
+    
+    The L2-normalised document vectors are stored as a SciPy sparse
+    term x document matrix, so a batch of queries is scored as a single
+    sparse matrix product of the stacked query vectors with it.
+    """
+    
+    def __init__(self, knowledge_base, include_answers=False):
+        self.knowledge_base = knowledge_base
+        self.include_answers = include_answers
+        self.build_index()
+    
+    def build_index(self):
+        """Build the L2-normalised TF-IDF matrix for all documents"""
+        doc_counts = []
+        doc_freqs = {}
+        for qa in self.knowledge_base:
+            text = qa['question']
+            if self.include_answers:
+                text += ' ' + qa.get('answer', '')
+            counts = {}
+            for token in tokenize(text):
+                counts[token] = counts.get(token, 0) + 1
+            doc_counts.append(counts)
+            for token in counts:
+                doc_freqs[token] = doc_freqs.get(token, 0) + 1
+        
+        total_docs = len(doc_counts)
+        self.vocabulary = {term: column for column, term in enumerate(doc_freqs)}
+        self.idf = {
+            term: math.log((1 + total_docs) / (1 + df)) + 1
+            for term, df in doc_freqs.items()
+        }
+        
+        # Stored transposed (term x document) so query rows multiply it directly
+        self.matrix = self.stack([self.weigh(counts) for counts in doc_counts]).T.tocsr()
+    
+    def weigh(self, counts):
+        """Turn known-term counts into an L2-normalised TF-IDF vector"""
+        row = {
+            term: count * self.idf[term]
+            for term, count in counts.items() if term in self.idf
+        }
+        norm = math.sqrt(sum(weight * weight for weight in row.values()))
+        if norm:
+            for term in row:
+                row[term] /= norm
+        return row
+    
+    def vectorize(self, query):
+        """Return the normalised TF-IDF vector of a query"""
+        counts = {}
+        for token in tokenize(query):
+            counts[token] = counts.get(token, 0) + 1
+        return self.weigh(counts)
+    
+    def stack(self, rows):
+        """Stack {term: weight} rows into a sparse row x term matrix"""
+        indptr = [0]
+        indices = []
+        data = []
+        for row in rows:
+            indices.extend(self.vocabulary[term] for term in row)
+            data.extend(row.values())
+            indptr.append(len(indices))
+        return sparse.csr_matrix(
+            (np.array(data, dtype=np.float64), np.array(indices, dtype=np.int32), np.array(indptr, dtype=np.int32)),
+            shape=(len(rows), len(self.vocabulary))
+        )
+    
+    def score_batch(self, queries):
+        """Return the sparse query x document matrix of cosine similarities"""
+        scores = self.stack([self.vectorize(query) for query in queries]) @ self.matrix
+        scores.sort_indices()
+        return scores
+    
+    def best_matches(self, queries):
+        """Return one (doc_id, score) pair per query, in order"""
+        scores = self.score_batch(queries)
+        matches = []
+        for start, end in zip(scores.indptr[:-1], scores.indptr[1:]):
+            if start == end:
+                matches.append((None, 0))
+                continue
+            # Indices are sorted, so argmax picks the lowest doc id on ties
+            best = start + int(np.argmax(scores.data[start:end]))
+            matches.append((int(scores.indices[best]), float(scores.data[best])))
+        return matches
+    
+    def best_match(self, query):
+        """Return (doc_id, score) of the most similar question, or (None, 0)"""
+        return self.best_matches([query])[0]
+
+SCORERS = {
+    'overlap': WordOverlapScorer,
+    'bm25': BM25Scorer,
+    'tfidf': TfidfScorer,
+}
+
+# Intent keywords in priority order: the first intent found in a query wins
+INTENT_KEYWORDS = [
+    ('greeting', ['hello', 'hi', 'hey', 'greetings']),
+    ('help', ['help', 'what can you do', 'how do you work']),
+    ('ai', ['what is ai', 'artificial intelligence', 'define ai']),
+    ('machine_learning', ['machine learning', 'ml', 'deep learning']),
+    ('search', ['search algorithm', 'search', 'bfs', 'dfs', 'a*']),
+    ('neural', ['neural network', 'neural', 'deep learning', 'neuron']),
+]
+
+class IntentMatcher:
+    """Classify a query against all intent keywords in a single regex pass
+    
+    The keywords are compiled into one alternation anchored at token
+    boundaries, so 'ml' does not fire on 'html' nor 'hi' on 'machine'. The
+    lookahead lets matches overlap; at each position the longest keyword wins.
+    """
+    
+    def __init__(self, intents):
+        self.priority = {name: rank for rank, (name, _) in enumerate(intents)}
+        self.intents_by_keyword = {}
+        for name, keywords in intents:
+            for keyword in keywords:
+                self.intents_by_keyword.setdefault(keyword, []).append(name)
+        
+        alternation = '|'.join(re.escape(keyword) for keyword in sorted(self.intents_by_keyword, key=len, reverse=True))
+        self.pattern = re.compile(rf"(?=(?<![a-z0-9])({alternation})(?![a-z0-9]))")
+    
+    def matches(self, query):
+        """Return the set of intents whose keywords occur in a normalized query"""
+        return {intent for keyword in self.pattern.findall(query) for intent in self.intents_by_keyword[keyword]}
+    
+    def classify(self, query):
+        """Return the highest priority intent of a normalized query, or None"""
+        return min(self.matches(query), key=self.priority.__getitem__, default=None)
+
+INTENT_MATCHER = IntentMatcher(INTENT_KEYWORDS)
+
+class ResponseCache:
+    """Bounded LRU cache of generated responses with a TTL and hit/miss counters"""
+    
+    def __init__(self, max_entries=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key):
+        """Return the cached response for a key, or None"""
+        if not self.max_entries:
+            return None
+        
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires_at, response = entry
+                if expires_at > time.monotonic():
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return response
+                del self.entries[key]
+            self.misses += 1
+            return None
+    
+    def put(self, key, response):
+        """Cache a response, evicting the least recently used entries"""
+        if not self.max_entries:
+            return
+        
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, response)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+    
+    def stats(self):
+        """Return the cache size and hit/miss counters"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0
+            }
+
+class AIResponseGenerator:
+    """Generate AI responses based on user queries
+    
+    Queries are normalized (case, whitespace, punctuation) before anything
+    else and deterministic responses are cached under the normalized
+    query. Misspelled words are corrected only when the query as typed
+    matches no question but the corrected one does. The cache belongs to
+    the generator, which is rebuilt with every dataset, so a reload starts
+    with an empty cache.
+    """
+    
+    def __init__(self, knowledge_base, scorer='overlap', spelling=None):
+        self.knowledge_base = knowledge_base
+        # Either a SCORERS name or an already built scorer
+        self.scorer = SCORERS[scorer](knowledge_base) if isinstance(scorer, str) else scorer
+        self.spelling = spelling if spelling is not None else SpellingIndex(knowledge_base)
+        self.cache = ResponseCache()
         self.response_templates = {
             'greeting': [
                 "Hello! I'm StudBot, your AI learning companion. I'm here to help you understand Artificial Intelligence concepts!",
@@ -62,52 +704,134 @@ class AIResponseGenerator:
     
     def find_best_match(self, query):
         """Find the best matching Q&A pair for the query"""
-        query_lower = query.lower()
-        best_match = None
-        best_score = 0
+        doc_id, score = self.scorer.best_match(query)
+        if doc_id is None:
+            return None, score
+        return self.knowledge_base[doc_id], score
+    
+    def find_best_matches(self, queries):
+        """Find the best matching Q&A pair for each query in one scoring pass"""
+        return [
+            (self.knowledge_base[doc_id] if doc_id is not None else None, score)
+            for doc_id, score in self.scorer.best_matches(queries)
+        ]
+    
+    def generate_response(self, query):
+        """Generate AI response for the given query"""
+        return self.generate_reply(query)[0]
+    
+    def generate_reply(self, query):
+        """Return (response, index of the answering Q&A pair or None) for the query"""
+        query = normalize_query(query)
+        response = self.template_response(query)
+        if response is not None:
+            return response, None
         
-        for qa in self.knowledge_base:
-            score = self.calculate_similarity(query_lower, qa['question'].lower())
-            if score > best_score:
-                best_score = score
-                best_match = qa
+        reply = self.cache.get(query)
+        if reply is None:
+            # Find best matching Q&A
+            scored_query, doc_id, score = self.score_queries([query])[0]
+            reply = self.match_reply(query, scored_query, doc_id, score)
+        return reply
+    
+    def generate_responses(self, queries):
+        """Generate AI responses for a batch of queries with one scoring pass"""
+        queries = [normalize_query(query) for query in queries]
+        responses = [self.template_response(query) for query in queries]
+        pending = []
+        for i, response in enumerate(responses):
+            if response is None:
+                reply = self.cache.get(queries[i])
+                if reply is None:
+                    pending.append(i)
+                else:
+                    responses[i] = reply[0]
         
-        return best_match, best_score
+        scored = self.score_queries([queries[i] for i in pending])
+        for i, (scored_query, doc_id, score) in zip(pending, scored):
+            responses[i] = self.match_reply(queries[i], scored_query, doc_id, score)[0]
+        return responses
     
-    def calculate_similarity(self, query, question):
-        """Calculate similarity between query and question"""
-        # Simple keyword matching
-        query_words = set(query.split())
-        question_words = set(question.split())
+    def score_queries(self, queries):
+        """Return (query, doc_id, score) per normalized query, spelling-corrected where that helps
         
-        if not query_words:
-            return 0
+        A correction is only kept when the query as typed matches no
+        question and the corrected query does, so correctly spelled words
+        the vocabulary lacks are left alone.
+        """
+        threshold = self.scorer.threshold
+        scored = [(query, doc_id, score) for query, (doc_id, score) in zip(queries, self.scorer.best_matches(queries))]
         
-        intersection = query_words.intersection(question_words)
-        return len(intersection) / len(query_words)
-    
-    def generate_response(self, query):
-        """Generate AI response for the given query"""
-        # Check for greetings
-        if any(word in query.lower() for word in ['hello', 'hi', 'hey', 'greetings']):
-            return random.choice(self.response_templates['greeting'])
+        # Retry the weak matches whose correction differs, again in one batch
+        retry = []
+        for i, (query, doc_id, score) in enumerate(scored):
+            if doc_id is None or score <= threshold:
+                corrected = self.spelling.correct(query)
+                if corrected != query:
+                    retry.append((i, corrected))
         
-        # Check for help requests
-        if any(word in query.lower() for word in ['help', 'what can you do', 'how do you work']):
-            return random.choice(self.response_templates['help'])
+        for (i, corrected), (doc_id, score) in zip(retry, self.scorer.best_matches([corrected for _, corrected in retry])):
+            if doc_id is not None and score > threshold:
+                scored[i] = (corrected, doc_id, score)
+        return scored
+    
+    def template_response(self, query):
+        """Return a canned greeting or help response, or None for other queries"""
+        intent = INTENT_MATCHER.classify(query)
+        if intent in ('greeting', 'help'):
+            return random.choice(self.response_templates[intent])
         
-        # Find best matching Q&A
-        best_match, score = self.find_best_match(query)
+        return None
+    
+    def match_reply(self, key, query, doc_id, score):
+        """Return (response, answering doc_id or None) for a query scored by score_queries
         
-        if best_match and score > 0.3:  # Threshold for good match
-            return self.format_response(best_match)
+        Deterministic replies are cached under key, the normalized query as
+        typed; the randomized fallback is not, so it keeps varying.
+        """
+        if doc_id is not None and score > self.scorer.threshold:  # Threshold for good match
+            reply = (self.format_response(self.knowledge_base[doc_id]), doc_id)
         else:
-            return self.generate_contextual_response(query)
+            response = self.generate_topic_response(query)
+            if response is None:
+                return random.choice(self.response_templates['fallback']), None
+            reply = (response, None)
+        
+        self.cache.put(key, reply)
+        return reply
+    
+    def stream_response(self, query, chunk_size=STREAM_CHUNK_SIZE):
+        """Yield ('header' | 'chunk', text) pieces of the response for the query
+        
+        A matched Q&A pair yields its question header before any of the
+        answer, then the answer in chunks. The texts joined together equal
+        generate_response(query).
+        """
+        query = normalize_query(query)
+        response = self.template_response(query)
+        if response is None:
+            query, doc_id, score = self.score_queries([query])[0]
+            if doc_id is not None and score > self.scorer.threshold:
+                best_match = self.knowledge_base[doc_id]
+                yield 'header', self.format_header(best_match)
+                response = self.format_body(best_match)
+            else:
+                response = self.generate_contextual_response(query)
+        
+        for start in range(0, len(response), chunk_size):
+            yield 'chunk', response[start:start + chunk_size]
     
     def format_response(self, qa_pair):
         """Format Q&A pair into a response"""
-        response = f"**{qa_pair['question']}**\n\n"
-        response += qa_pair['answer']
+        return self.format_header(qa_pair) + self.format_body(qa_pair)
+    
+    def format_header(self, qa_pair):
+        """Format the question heading of a Q&A response"""
+        return f"**{qa_pair['question']}**\n\n"
+    
+    def format_body(self, qa_pair):
+        """Format the answer and keywords of a Q&A response"""
+        response = qa_pair['answer']
         
         if qa_pair.get('keywords'):
             response += f"\n\n*Keywords: {', '.join(qa_pair['keywords'])}*"
@@ -116,10 +840,17 @@ class AIResponseGenerator:
     
     def generate_contextual_response(self, query):
         """Generate contextual response based on query keywords"""
-        query_lower = query.lower()
+        response = self.generate_topic_response(normalize_query(query))
+        if response is None:
+            response = random.choice(self.response_templates['fallback'])
+        return response
+    
+    def generate_topic_response(self, query):
+        """Return the canned explanation of a topic named in a normalized query, or None"""
+        intent = INTENT_MATCHER.classify(query)
         
         # AI Definition
-        if any(word in query_lower for word in ['what is ai', 'artificial intelligence', 'define ai']):
+        if intent == 'ai':
             return """**What is Artificial Intelligence?**
 
 Artificial Intelligence (AI) is the science and engineering of making intelligent machines, especially intelligent computer programs. It enables computers to perform tasks that typically require human intelligence, including learning, reasoning, problem-solving, perception, and understanding language.
@@ -134,7 +865,7 @@ Artificial Intelligence (AI) is the science and engineering of making intelligen
 AI is transforming various industries and becoming an essential part of modern technology!"""
         
         # Machine Learning
-        elif any(word in query_lower for word in ['machine learning', 'ml', 'deep learning']):
+        elif intent == 'machine_learning':
             return """**Machine Learning Explained**
 
 Machine Learning is a subset of AI that focuses on algorithms and statistical models that enable computer systems to improve their performance on a specific task through experience, without being explicitly programmed.
@@ -148,7 +879,7 @@ Machine Learning is a subset of AI that focuses on algorithms and statistical mo
 **Applications**: Recommendation systems, image recognition, natural language processing, autonomous vehicles, and much more!"""
         
         # Search Algorithms
-        elif any(word in query_lower for word in ['search algorithm', 'search', 'bfs', 'dfs', 'a*']):
+        elif intent == 'search':
             return """**Search Algorithms in AI**
 
 Search algorithms are fundamental techniques for finding solutions to problems by exploring possible states or paths. They're crucial for problem-solving agents.
@@ -166,7 +897,7 @@ Search algorithms are fundamental techniques for finding solutions to problems b
 **Applications**: Pathfinding, puzzle solving, game playing, and many other AI applications!"""
         
         # Neural Networks
-        elif any(word in query_lower for word in ['neural network', 'neural', 'deep learning', 'neuron']):
+        elif intent == 'neural':
             return """**Neural Networks Explained**
 
 Neural Networks are computing systems inspired by biological neural networks. They consist of interconnected nodes (neurons) that process information by responding to external inputs.
@@ -181,55 +912,1251 @@ Neural Networks are computing systems inspired by biological neural networks. Th
 **Deep Learning** uses neural networks with many hidden layers to model complex patterns in data, leading to breakthroughs in computer vision, NLP, and more!"""
         
         else:
-            return random.choice(self.response_templates['fallback'])
+            return None
+
+class TrigramIndex:
+    """Substring search over question, answer and keyword fields
+    
+    Every field is lowercased once and its character trigrams are indexed.
+    A query's trigram posting lists are intersected to get candidates and
+    only those candidates are checked for the actual substring.
+    """
+    
+    def __init__(self, knowledge_base):
+        self.knowledge_base = knowledge_base
+        self.build_index()
+    
+    def build_index(self):
+        """Lowercase all searchable fields and index their trigrams"""
+        self.fields = []
+        self.postings = {}
+        for doc_id, qa in enumerate(self.knowledge_base):
+            fields = (qa.get('question', '').lower(), qa.get('answer', '').lower()) + tuple(
+                keyword.lower() for keyword in qa.get('keywords', [])
+            )
+            self.fields.append(fields)
+            
+            trigrams = set()
+            for field in fields:
+                trigrams.update(field[i:i + 3] for i in range(len(field) - 2))
+            for trigram in trigrams:
+                self.postings.setdefault(trigram, set()).add(doc_id)
+    
+    def candidates(self, query_lower):
+        """Return the ids of documents containing every trigram of the query"""
+        if len(query_lower) < 3:
+            # Too short to have a trigram, every document is a candidate
+            return range(len(self.fields))
+        
+        trigrams = {query_lower[i:i + 3] for i in range(len(query_lower) - 2)}
+        posting_sets = sorted((self.postings.get(trigram, set()) for trigram in trigrams), key=len)
+        return sorted(posting_sets[0].intersection(*posting_sets[1:]))
+    
+    def search(self, query):
+        """Return ids of documents with the query in any field, in corpus order"""
+        query_lower = query.lower()
+        return [
+            doc_id for doc_id in self.candidates(query_lower)
+            if any(query_lower in field for field in self.fields[doc_id])
+        ]
+
+def bit_ids(bits):
+    """Return the document ids of a bitmap in ascending order"""
+    # Reversed binary digits put bit i at index i; find() skips the zeros in C
+    digits = bin(bits)[:1:-1]
+    doc_ids = []
+    doc_id = digits.find('1')
+    while doc_id != -1:
+        doc_ids.append(doc_id)
+        doc_id = digits.find('1', doc_id + 1)
+    return doc_ids
+
+class FacetIndex:
+    """Category, marks and keyword bitmaps over the knowledge base
+    
+    Each facet value maps to a Python int used as a bitmap, bit i standing
+    for document i, so filter-only queries are bitwise ANDs. Text matches
+    are filtered and facets counted from each document's own values, so
+    that work grows with the number of results, not the corpus.
+    """
+    
+    facets = ('category', 'marks', 'keyword')
+    
+    def __init__(self, knowledge_base):
+        self.knowledge_base = knowledge_base
+        self.build_index()
+    
+    def build_index(self):
+        """Set one bit per document in the bitmap of each of its facet values"""
+        self.all = (1 << len(self.knowledge_base)) - 1
+        self.bitmaps = {facet: {} for facet in self.facets}
+        self.values = []
+        for doc_id, qa in enumerate(self.knowledge_base):
+            bit = 1 << doc_id
+            values = {
+                'category': [qa.get('category')] if qa.get('category') else [],
+                'marks': [qa.get('marks')] if qa.get('marks') is not None else [],
+                'keyword': list(dict.fromkeys(keyword.lower() for keyword in qa.get('keywords', []))),
+            }
+            self.values.append(values)
+            for facet, facet_values in values.items():
+                bitmaps = self.bitmaps[facet]
+                for value in facet_values:
+                    bitmaps[value] = bitmaps.get(value, 0) | bit
+    
+    def filter(self, filters, doc_ids=None):
+        """Return the ascending ids of documents matching every {facet: value} filter
+        
+        With doc_ids (ascending), only those documents are checked, against
+        their own facet values; otherwise the facet bitmaps are intersected.
+        """
+        if 'keyword' in filters:
+            filters = dict(filters, keyword=filters['keyword'].lower())
+        
+        if doc_ids is not None:
+            return [
+                doc_id for doc_id in doc_ids
+                if all(value in self.values[doc_id][facet] for facet, value in filters.items())
+            ]
+        
+        bits = self.all
+        for facet, value in filters.items():
+            bits &= self.bitmaps[facet].get(value, 0)
+        return bit_ids(bits)
+    
+    def counts(self, doc_ids, max_values=MAX_FACET_VALUES):
+        """Return {facet: {value: count}} of the most frequent values among documents"""
+        counts = {facet: {} for facet in self.facets}
+        for doc_id in doc_ids:
+            for facet, values in self.values[doc_id].items():
+                facet_counts = counts[facet]
+                for value in values:
+                    facet_counts[value] = facet_counts.get(value, 0) + 1
+        return {
+            facet: dict(heapq.nsmallest(max_values, facet_counts.items(),
+                                        key=lambda item: (-item[1], str(item[0]))))
+            for facet, facet_counts in counts.items()
+        }
+
+class SuggestIndex:
+    """Autocomplete over knowledge base questions and keywords
+    
+    Every suggestion is filed in a sorted array under each of its word
+    starts, so both 'what is a' and 'a*' complete 'What is A* search?'. A
+    prefix maps to one contiguous slice found by binary search. Suggestions
+    carry a precomputed rank, so the top N of a slice need no scoring.
+    """
+    
+    def __init__(self, knowledge_base):
+        self.knowledge_base = knowledge_base
+        self.build_index()
+    
+    def build_index(self):
+        """Collect and rank the suggestions and sort their word-start keys"""
+        # Keywords are as popular as the number of Q&A pairs tagged with
+        # them, questions as the marks they carry
+        keyword_counts = {}
+        for qa in self.knowledge_base:
+            for keyword in dict.fromkeys(qa.get('keywords', [])):
+                keyword_counts[keyword] = keyword_counts.get(keyword, 0) + 1
+        
+        candidates = [(count, {'text': keyword, 'type': 'keyword'}) for keyword, count in keyword_counts.items()]
+        candidates += [
+            (qa.get('marks', 0), {'text': qa['question'], 'type': 'question', 'id': qa.get('id')})
+            for qa in self.knowledge_base if qa.get('question')
+        ]
+        candidates.sort(key=lambda candidate: (-candidate[0], len(candidate[1]['text']), candidate[1]['text']))
+        self.suggestions = [suggestion for _, suggestion in candidates]
+        
+        entries = []
+        for rank, suggestion in enumerate(self.suggestions):
+            words = normalize_query(suggestion['text']).split()
+            for start in range(len(words)):
+                entries.append((' '.join(words[start:]), rank))
+        entries.sort()
+        self.keys = [key for key, _ in entries]
+        self.ranks = [rank for _, rank in entries]
+    
+    def suggest(self, prefix, limit=DEFAULT_SUGGESTIONS):
+        """Return the top ranked suggestions completing a normalized prefix"""
+        if not prefix:
+            return []
+        
+        start = bisect.bisect_left(self.keys, prefix)
+        end = bisect.bisect_left(self.keys, prefix + '\uffff', start)
+        # A suggestion matching at several word starts is listed once
+        ranks = heapq.nsmallest(limit, set(self.ranks[start:end]))
+        return [self.suggestions[rank] for rank in ranks]
+
+class RelatedGraph:
+    """Precomputed k-nearest-neighbour graph of related Q&A pairs and MCQs
+    
+    Questions, keywords and categories of all Q&A pairs and MCQs are
+    embedded as TF-IDF vectors in one space. At build time the cosines of
+    each block of Q&A pairs against every record come from one sparse
+    matrix product, and each Q&A pair keeps its k most similar Q&A pairs
+    and MCQs, so a lookup only reads k entries.
+    """
+    
+    def __init__(self, knowledge_base, mcq_data, k=RELATED_K):
+        self.knowledge_base = knowledge_base
+        self.mcq_data = mcq_data
+        self.k = k
+        self.build_index()
+    
+    def build_index(self):
+        """Embed every record and keep the top k neighbours of each Q&A pair"""
+        records = list(self.knowledge_base) + list(self.mcq_data)
+        doc_counts = []
+        doc_freqs = {}
+        for record in records:
+            text = ' '.join([record.get('question', ''), record.get('category', '')] + list(record.get('keywords', [])))
+            counts = {}
+            for token in tokenize(text):
+                counts[token] = counts.get(token, 0) + 1
+            doc_counts.append(counts)
+            for token in counts:
+                doc_freqs[token] = doc_freqs.get(token, 0) + 1
+        
+        # L2-normalised TF-IDF rows of every record in one sparse matrix
+        columns = {term: column for column, term in enumerate(doc_freqs)}
+        idf = np.array([math.log((1 + len(records)) / (1 + df)) + 1 for df in doc_freqs.values()])
+        indptr = [0]
+        indices = []
+        data = []
+        for counts in doc_counts:
+            indices.extend(columns[term] for term in counts)
+            data.extend(counts.values())
+            indptr.append(len(indices))
+        matrix = sparse.csr_matrix((np.array(data, dtype=np.float64), indices, indptr),
+                                   shape=(len(records), len(columns)))
+        matrix = matrix.multiply(idf).tocsr()
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        matrix = sparse.diags(1 / norms) @ matrix
+        transposed = matrix.T.tocsr()
+        
+        qa_count = len(self.knowledge_base)
+        self.positions = {qa.get('id'): doc_id for doc_id, qa in enumerate(self.knowledge_base)}
+        self.questions = []
+        self.mcqs = []
+        # Cosines of a block of Q&A pairs against every record at a time,
+        # keeping memory bounded while NumPy does the scoring
+        for start in range(0, qa_count, RELATED_BLOCK_SIZE):
+            stop = min(start + RELATED_BLOCK_SIZE, qa_count)
+            scores = (matrix[start:stop] @ transposed).toarray()
+            scores[np.arange(stop - start), np.arange(start, stop)] = 0
+            for row in scores:
+                self.questions.append(self.top(row[:qa_count]))
+                self.mcqs.append(self.top(row[qa_count:]))
+    
+    def top(self, scores):
+        """Return the k (index, score) pairs with the highest positive scores, ties by index"""
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > self.k:
+            # Keep every candidate tied with the k-th best so ties resolve by index
+            kth = np.partition(scores[candidates], len(candidates) - self.k)[len(candidates) - self.k]
+            candidates = candidates[scores[candidates] >= kth]
+        ranked = candidates[np.lexsort((candidates, -scores[candidates]))][:self.k]
+        return tuple((int(index), round(float(scores[index]), 4)) for index in ranked)
+    
+    def related(self, doc_id):
+        """Return the related Q&A pairs and MCQs of the Q&A pair at doc_id"""
+        return {
+            'questions': [
+                {
+                    'id': self.knowledge_base[index].get('id'),
+                    'question': self.knowledge_base[index].get('question'),
+                    'category': self.knowledge_base[index].get('category'),
+                    'score': score
+                }
+                for index, score in self.questions[doc_id]
+            ],
+            'mcqs': [
+                {
+                    'id': self.mcq_data[index].get('id'),
+                    'question': self.mcq_data[index].get('question'),
+                    'category': self.mcq_data[index].get('category'),
+                    'difficulty': self.mcq_data[index].get('difficulty'),
+                    'score': score
+                }
+                for index, score in self.mcqs[doc_id]
+            ]
+        }
+
+class QuizBank:
+    """MCQs pre-bucketed by difficulty, unit and topic
+    
+    Every MCQ is filed under each (difficulty, unit, topic) combination
+    with None as a wildcard, so any filter maps to one prebuilt bucket and
+    a quiz is drawn by sampling k indices from it.
+    """
+    
+    def __init__(self, mcqs):
+        self.mcqs = mcqs
+        self.build_buckets()
+    
+    def build_buckets(self):
+        """File every MCQ under all of its filter combinations"""
+        self.buckets = {}
+        self.by_id = {}
+        for mcq in self.mcqs:
+            self.by_id[mcq.get('id')] = mcq
+            keys = itertools.product(
+                (mcq.get('difficulty', 'medium'), None),
+                (mcq.get('unit'), None),
+                (mcq.get('topic'), None)
+            )
+            for key in keys:
+                self.buckets.setdefault(key, []).append(mcq)
+    
+    def sample(self, difficulty=None, unit=None, topic=None, k=QUIZ_SIZE):
+        """Draw up to k random MCQs matching the filters"""
+        bucket = self.buckets.get((difficulty, unit, topic), [])
+        indices = random.sample(range(len(bucket)), min(k, len(bucket)))
+        return [bucket[i] for i in indices]
+
+class QuizSessionStore:
+    """Bounded in-memory store of issued quizzes, evicted after a TTL
+    
+    Sessions all share one TTL, so insertion order is also expiry order and
+    expired sessions are always at the front of the OrderedDict.
+    """
+    
+    def __init__(self, max_sessions=10000, ttl=3600):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+    
+    def create(self, question_ids):
+        """Store the question ids of a new quiz and return its session id"""
+        session_id = secrets.token_urlsafe(16)
+        now = time.monotonic()
+        with self.lock:
+            self.evict_expired(now)
+            self.sessions[session_id] = (now + self.ttl, tuple(question_ids))
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+        return session_id
+    
+    def pop(self, session_id):
+        """Remove a session and return its question ids, or None if unknown or expired"""
+        with self.lock:
+            entry = self.sessions.pop(session_id, None)
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        return entry[1]
+    
+    def evict_expired(self, now):
+        """Drop expired sessions from the front of the store"""
+        while self.sessions:
+            expires_at, _ = next(iter(self.sessions.values()))
+            if expires_at > now:
+                break
+            self.sessions.popitem(last=False)
+
+class UsedNonces:
+    """Registry of spent single-use nonces shared by the processes of a server
+    
+    Nonces are rows of a SQLite file whose primary key rejects a second
+    insert, so exactly one process can claim each nonce. Rows are dropped
+    once the session they belong to has expired.
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.pid = None
+        self.lock = threading.Lock()
+    
+    def connection(self):
+        """Return this process's connection; SQLite connections must not cross a fork"""
+        if self.pid != os.getpid():
+            self.db = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            self.db.execute('CREATE TABLE IF NOT EXISTS used_nonces (nonce TEXT PRIMARY KEY, expires_at REAL)')
+            self.db.execute('CREATE INDEX IF NOT EXISTS used_nonces_expiry ON used_nonces (expires_at)')
+            self.pid = os.getpid()
+        return self.db
+    
+    def claim(self, nonce, expires_at):
+        """Mark a nonce as used; return False if it already was"""
+        with self.lock:
+            db = self.connection()
+            db.execute('DELETE FROM used_nonces WHERE expires_at <= ?', (time.time(),))
+            try:
+                db.execute('INSERT INTO used_nonces VALUES (?, ?)', (nonce, expires_at))
+            except sqlite3.IntegrityError:
+                return False
+        return True
+
+class SignedQuizSessions:
+    """Quiz sessions for multi-process servers
+    
+    The session id itself carries the question ids, expiry time and a
+    nonce, signed with a secret shared by every worker, so any worker can
+    grade a quiz that another worker issued. The nonce is claimed in a
+    UsedNonces registry on submission, so each session is graded once.
+    Same interface as QuizSessionStore.
+    """
+    
+    def __init__(self, secret, used, ttl=3600):
+        self.secret = secret
+        self.used = used
+        self.ttl = ttl
+    
+    def sign(self, token):
+        return hmac.new(self.secret, token.encode('ascii'), hashlib.sha256).hexdigest()[:32]
+    
+    def create(self, question_ids):
+        """Encode the question ids of a new quiz into a signed session id"""
+        payload = json.dumps([int(time.time()) + self.ttl, list(question_ids), secrets.token_urlsafe(12)],
+                             separators=(',', ':'))
+        token = base64.urlsafe_b64encode(payload.encode('utf-8')).rstrip(b'=').decode('ascii')
+        return f"{token}.{self.sign(token)}"
+    
+    def pop(self, session_id):
+        """Return the question ids of a session, or None if forged, expired or already used"""
+        if not isinstance(session_id, str) or not session_id.isascii():
+            return None
+        
+        token, _, signature = session_id.partition('.')
+        if not hmac.compare_digest(signature, self.sign(token)):
+            return None
+        
+        expires_at, question_ids, nonce = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        if expires_at <= time.time() or not self.used.claim(nonce, expires_at):
+            return None
+        return tuple(question_ids)
+
+def compress(body, encoding, level=None):
+    """Compress a body with one of CONTENT_ENCODINGS, at maximum level by default"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=11 if level is None else level)
+    return gzip.compress(body, 9 if level is None else level, mtime=0)
+
+class PrecomputedResponse:
+    """JSON payload encoded and compressed once, served with a content-hash ETag
+    
+    Each content coding is a separate representation with its own ETag, so
+    caches never hand a gzipped body to a client that did not ask for one.
+    """
+    
+    def __init__(self, payload=None, body=None):
+        self.body = body if body is not None else app.json.dumps(payload).encode('utf-8')
+        self.etag = hashlib.sha256(self.body).hexdigest()[:32]
+        self.encoded = {encoding: compress(self.body, encoding) for encoding in CONTENT_ENCODINGS}
+    
+    def variant(self, accept_encodings):
+        """Return (content coding or None, body, etag) for the client's Accept-Encoding"""
+        encoding = accept_encodings.best_match(list(self.encoded))
+        if encoding is None:
+            return None, self.body, self.etag
+        return encoding, self.encoded[encoding], f'{self.etag}-{encoding}'
+    
+    def make_response(self, cache_control='no-cache'):
+        """Return the payload, or 304 if the client already has this version"""
+        encoding, body, etag = self.variant(request.accept_encodings)
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(body, mimetype='application/json')
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = cache_control
+        response.vary.add('Accept-Encoding')
+        return response
 
-# Initialize AI response generator
-ai_generator = AIResponseGenerator(knowledge_base)
+def slugify(value):
+    """Turn a facet value such as 'Unit 1' into a URL segment such as 'unit-1'"""
+    return re.sub(r'[^a-z0-9]+', '-', str(value).lower()).strip('-')
+
+class McqShards:
+    """MCQs split into content-addressed shards by difficulty, unit and topic
+    
+    Every shard URL embeds a hash of the shard's body, so the content under
+    a URL never changes and browsers and CDNs may cache it for a year. Only
+    the small manifest listing the current URLs needs revalidating. Shards
+    hold the QUIZ_FIELDS of each MCQ, never its answer or explanation;
+    clients grade quizzes drawn from them through a quiz session.
+    """
+    
+    facets = ('difficulty', 'unit', 'topic')
+    
+    def __init__(self, mcq_data):
+        self.mcq_data = mcq_data
+        self.build_shards()
+    
+    def build_shards(self):
+        """Group the MCQs by each facet and precompute every shard and the manifest"""
+        groups = {}
+        for mcq in self.mcq_data:
+            for facet in self.facets:
+                value = mcq.get(facet)
+                if value:
+                    groups.setdefault((facet, value), []).append(
+                        {field: mcq[field] for field in QUIZ_FIELDS if field in mcq}
+                    )
+        
+        self.shards = {}
+        manifest = {facet: {} for facet in self.facets}
+        for (facet, value), mcqs in sorted(groups.items()):
+            response = PrecomputedResponse({'facet': facet, 'value': value, 'mcqs': mcqs})
+            # Values that slugify alike ('Unit 1', 'unit-1') get numbered slugs
+            base = slugify(value) or 'shard'
+            slug, suffix = base, 1
+            while (facet, slug) in self.shards:
+                suffix += 1
+                slug = f'{base}-{suffix}'
+            self.shards[facet, slug] = response
+            manifest[facet][value] = {
+                'url': f'/api/mcq/shards/{facet}/{slug}.{response.etag[:16]}.json',
+                'count': len(mcqs),
+                'hash': response.etag
+            }
+        self.manifest = PrecomputedResponse({'total': len(self.mcq_data), 'shards': manifest})
+    
+    def shard(self, facet, name):
+        """Return the shard a 'slug.hash.json' name refers to, or None if unknown or outdated"""
+        slug, _, rest = name.partition('.')
+        response = self.shards.get((facet, slug))
+        if response is None or rest != response.etag[:16] + '.json':
+            return None
+        return response
+
+def parse_fields(fields, allowed, default):
+    """Turn a ?fields= value (comma separated, or a JSON list) into a projection
+    
+    Returns (fields, error); the fields keep the order of `allowed`.
+    """
+    if fields in (None, '', []):
+        return default, None
+    if isinstance(fields, str):
+        fields = fields.split(',')
+    if not isinstance(fields, list) or not all(isinstance(field, str) for field in fields):
+        return None, 'fields must be a comma separated list of field names'
+    
+    requested = {field.strip() for field in fields if field.strip()}
+    unknown = requested.difference(allowed)
+    if unknown:
+        return None, f"Unknown fields: {', '.join(sorted(unknown))}"
+    return tuple(field for field in allowed if field in requested), None
+
+def encode_json(value):
+    """Encode a value compactly, the way jsonify does outside debug mode"""
+    return app.json.dumps(value, separators=JSON_SEPARATORS).encode('utf-8')
+
+def assemble_json(payload):
+    """Encode a top-level dict whose list values may be pre-encoded fragments
+    
+    Lists of bytes are joined as-is; everything else is encoded normally.
+    Keys are sorted to match jsonify.
+    """
+    parts = []
+    for key in sorted(payload):
+        value = payload[key]
+        if isinstance(value, list) and value and isinstance(value[0], bytes):
+            encoded = b'[' + b','.join(value) + b']'
+        else:
+            encoded = encode_json(value)
+        parts.append(encode_json(key) + b':' + encoded)
+    return PreencodedJSON(b'{' + b','.join(parts) + b'}')
+
+class FragmentStore:
+    """Per-record JSON fragments, encoded once per field projection
+    
+    The projections listed up front are encoded for every record when the
+    dataset loads, so list responses are assembled by joining bytes instead
+    of re-encoding every record. Any other projection is encoded record by
+    record as requests need them, and kept for the MAX_CACHED_PROJECTIONS
+    most recently used projections.
+    """
+    
+    def __init__(self, records, projections=(), encoded=None):
+        self.records = {record.get('id'): record for record in records}
+        # encoded: the projections map of a snapshot, used instead of encoding again
+        self.projections = encoded if encoded is not None else {fields: self.encode(fields) for fields in projections}
+        self.recent = OrderedDict()
+        self.lock = threading.Lock()
+    
+    def encode(self, fields):
+        """Encode every record projected onto the given fields (None: whole records), keyed by record id"""
+        return {record_id: self.encode_record(record, fields) for record_id, record in self.records.items()}
+    
+    def encode_record(self, record, fields):
+        """Encode one record projected onto the given fields"""
+        if fields is not None:
+            record = {field: record[field] for field in fields if field in record}
+        return encode_json(record)
+    
+    def fragments(self, records, fields):
+        """Return the encoded projections of the given records, in order"""
+        fragments = self.projections.get(fields)
+        if fragments is not None:
+            return [fragments[record.get('id')] for record in records]
+        
+        with self.lock:
+            fragments = self.recent.pop(fields, None) or {}
+            self.recent[fields] = fragments
+            if len(self.recent) > MAX_CACHED_PROJECTIONS:
+                self.recent.popitem(last=False)
+        
+        result = []
+        for record in records:
+            record_id = record.get('id')
+            fragment = fragments.get(record_id)
+            if fragment is None:
+                fragment = fragments[record_id] = self.encode_record(self.records[record_id], fields)
+            result.append(fragment)
+        return result
+
+class ChangeLog:
+    """Versioned history of the records added, changed and removed by reloads
+    
+    Records are identified by id and fingerprinted by content hash when a
+    dataset is loaded. A reload compares the fingerprints once and files
+    the differences under a new version, so answering 'changes since v'
+    only walks the change sets newer than v. Versions are the millisecond
+    time of the load that produced them; a version older than the kept
+    history, such as one issued before a restart, gets a full resync.
+    """
+    
+    def __init__(self, records, hashes=None):
+        self.records = {record.get('id'): record for record in records}
+        # hashes: the fingerprints of a snapshot, used instead of hashing again
+        self.hashes = hashes if hashes is not None else {
+            record_id: record.content_hash() for record_id, record in self.records.items()
+        }
+        self.version = int(time.time() * 1000)
+        self.base_version = self.version
+        self.history = []
+    
+    def follow(self, previous):
+        """Continue the history of the log for the dataset this one replaces"""
+        added = [record_id for record_id in self.hashes if record_id not in previous.hashes]
+        removed = [record_id for record_id in previous.hashes if record_id not in self.hashes]
+        changed = [
+            record_id for record_id, content_hash in self.hashes.items()
+            if record_id in previous.hashes and previous.hashes[record_id] != content_hash
+        ]
+        
+        self.base_version = previous.base_version
+        self.history = list(previous.history)
+        if not (added or changed or removed):
+            self.version = previous.version
+            return
+        
+        self.version = max(self.version, previous.version + 1)
+        self.history.append((self.version, added, changed, removed))
+        if len(self.history) > MAX_CHANGE_VERSIONS:
+            # Clients older than the dropped change sets get a full resync
+            self.base_version = self.history.pop(0)[0]
+    
+    def changes(self, since):
+        """Return the changes payload bringing a client at version `since` up to date"""
+        if since is None or since < self.base_version or since > self.version:
+            return {'version': self.version, 'full': True, 'added': list(self.records.values()),
+                    'changed': [], 'removed': []}
+        
+        # For each id, whether it existed at `since` follows from its first
+        # change after it, and whether it exists now from the current records
+        existed = {}
+        start = bisect.bisect_right([entry[0] for entry in self.history], since)
+        for _, added, changed, removed in self.history[start:]:
+            for record_id in added:
+                existed.setdefault(record_id, False)
+            for record_id in itertools.chain(changed, removed):
+                existed.setdefault(record_id, True)
+        
+        payload = {'version': self.version, 'full': False, 'added': [], 'changed': [], 'removed': []}
+        for record_id, existed_before in existed.items():
+            record = self.records.get(record_id)
+            if record is None:
+                if existed_before:
+                    payload['removed'].append(record_id)
+            else:
+                payload['changed' if existed_before else 'added'].append(record)
+        return payload
+
+def dataset_last_updated():
+    """Return the modification time of the newest dataset file"""
+    mtimes = [os.path.getmtime(path) for path in (QA_DATASET_PATH, MCQ_DATASET_PATH) if os.path.exists(path)]
+    return datetime.fromtimestamp(max(mtimes)).isoformat() if mtimes else None
+
+def build_topics_response(knowledge_base):
+    """Precompute the /api/topics payload"""
+    topics = set(qa.get('category', '') for qa in knowledge_base if qa.get('category'))
+    return PrecomputedResponse({'topics': sorted(topics)})
+
+def build_stats_response(knowledge_base, mcq_data):
+    """Precompute the /api/stats payload"""
+    return PrecomputedResponse({
+        'total_questions': len(knowledge_base),
+        'total_mcqs': len(mcq_data),
+        'categories': len(set(qa.get('category', '') for qa in knowledge_base if qa.get('category'))),
+        'last_updated': dataset_last_updated()
+    })
+
+def build_search_results(knowledge_base):
+    """Precompute the search result of every Q&A pair, answer snippet included"""
+    return [
+        {
+            'id': qa.get('id'),
+            'question': qa.get('question'),
+            'answer': qa.get('answer')[:200] + '...' if len(qa.get('answer', '')) > 200 else qa.get('answer'),
+            'category': qa.get('category'),
+            'keywords': qa.get('keywords', [])
+        }
+        for qa in knowledge_base
+    ]
+
+def build_file_responses():
+    """Precompute the raw dataset files the static frontend fetches"""
+    responses = {}
+    for path in (QA_DATASET_PATH, MCQ_DATASET_PATH):
+        try:
+            with open(path, 'rb') as f:
+                responses[os.path.basename(path)] = PrecomputedResponse(body=f.read())
+        except FileNotFoundError:
+            pass
+    return responses
+
+def restore_object(cls, state):
+    """Recreate an index object from its attribute dict without rebuilding it"""
+    obj = cls.__new__(cls)
+    obj.__dict__.update(state)
+    return obj
+
+def source_signature():
+    """Size and modification time of each dataset file, used to detect stale snapshots"""
+    signature = {}
+    for path in (QA_DATASET_PATH, MCQ_DATASET_PATH):
+        try:
+            stat = os.stat(path)
+            signature[path] = (stat.st_size, stat.st_mtime_ns)
+        except FileNotFoundError:
+            signature[path] = None
+    return signature
+
+def snapshot_header(scorer):
+    """Header a snapshot must carry to be valid for the current sources"""
+    return {
+        'format': SNAPSHOT_FORMAT,
+        'python': sys.version_info[:2],
+        'scorer': scorer,
+        'sources': source_signature(),
+    }
+
+class Dataset:
+    """The loaded Q&A pairs and MCQs together with every index built from them"""
+    
+    def __init__(self, knowledge_base, mcq_data, scorer='overlap', indexes=None, sources=None):
+        self.knowledge_base = knowledge_base
+        self.mcq_data = mcq_data
+        self.scorer_name = scorer
+        self.sources = sources
+        
+        if indexes is None:
+            self.qa_changes = ChangeLog(knowledge_base)
+            self.mcq_changes = ChangeLog(mcq_data)
+            # Records pre-encoded for the list endpoints: whole records for
+            # delta sync, lean MCQs for quizzes and result snippets for search
+            self.qa_fragments = FragmentStore(knowledge_base, [None])
+            self.mcq_fragments = FragmentStore(mcq_data, [None, QUIZ_DEFAULT_FIELDS])
+            self.search_fragments = FragmentStore(build_search_results(knowledge_base), [SEARCH_RESULT_FIELDS])
+            self.spelling = SpellingIndex(knowledge_base)
+            self.ai_generator = AIResponseGenerator(knowledge_base, scorer, self.spelling)
+            self.search_index = TrigramIndex(knowledge_base)
+            self.facet_index = FacetIndex(knowledge_base)
+            self.suggest_index = SuggestIndex(knowledge_base)
+            self.related_graph = RelatedGraph(knowledge_base, mcq_data)
+            self.quiz_bank = QuizBank(mcq_data)
+            self.mcq_shards = McqShards(mcq_data)
+            self.topics_response = build_topics_response(knowledge_base)
+            self.stats_response = build_stats_response(knowledge_base, mcq_data)
+            self.file_responses = build_file_responses()
+        else:
+            self.qa_changes = ChangeLog(knowledge_base, indexes['qa_hashes'])
+            self.mcq_changes = ChangeLog(mcq_data, indexes['mcq_hashes'])
+            self.qa_fragments = FragmentStore(knowledge_base, encoded=indexes['qa_fragments'])
+            self.mcq_fragments = FragmentStore(mcq_data, encoded=indexes['mcq_fragments'])
+            self.search_fragments = FragmentStore(indexes['search_results'], encoded=indexes['search_fragments'])
+            self.spelling = restore_object(SpellingIndex, indexes['spelling'])
+            self.ai_generator = AIResponseGenerator(
+                knowledge_base, restore_object(SCORERS[scorer], indexes['scorer']), self.spelling
+            )
+            self.search_index = restore_object(TrigramIndex, indexes['search_index'])
+            self.facet_index = restore_object(FacetIndex, indexes['facet_index'])
+            self.suggest_index = restore_object(SuggestIndex, indexes['suggest_index'])
+            self.related_graph = restore_object(RelatedGraph, indexes['related_graph'])
+            self.quiz_bank = restore_object(QuizBank, indexes['quiz_bank'])
+            self.mcq_shards = restore_object(McqShards, indexes['mcq_shards'])
+            self.topics_response = restore_object(PrecomputedResponse, indexes['topics_response'])
+            self.stats_response = restore_object(PrecomputedResponse, indexes['stats_response'])
+            self.file_responses = {
+                name: restore_object(PrecomputedResponse, state) for name, state in indexes['file_responses'].items()
+            }
+    
+    @classmethod
+    def from_json(cls, scorer='overlap'):
+        """Load both JSON datasets and build all indexes from scratch"""
+        # Taken before reading so an edit made mid-load triggers another reload
+        sources = source_signature()
+        knowledge_base = load_knowledge_base()
+        mcq_data = load_mcq_data()
+        return cls(knowledge_base, mcq_data, scorer, sources=sources)
+    
+    @classmethod
+    def from_snapshot(cls, path=SNAPSHOT_PATH, scorer='overlap'):
+        """Load a snapshot written by write_snapshot, or None if missing or stale"""
+        try:
+            with open(path, 'rb') as f:
+                header = pickle.load(f)
+                if header != snapshot_header(scorer):
+                    return None
+                body = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        return cls(body['knowledge_base'], body['mcq_data'], scorer, indexes=body['indexes'],
+                   sources=header['sources'])
+    
+    def follow(self, previous):
+        """Carry the change history over from the dataset this one replaces"""
+        self.qa_changes.follow(previous.qa_changes)
+        self.mcq_changes.follow(previous.mcq_changes)
+    
+    def write_snapshot(self, path=SNAPSHOT_PATH):
+        """Write records and prebuilt indexes to a binary snapshot file
+        
+        The small header is pickled separately so that a stale snapshot
+        is rejected without decoding the body. Everything in the body is
+        pickled in one call, so records shared between indexes and
+        interned strings are stored once.
+        """
+        body = {
+            'knowledge_base': self.knowledge_base,
+            'mcq_data': self.mcq_data,
+            'indexes': {
+                'scorer': vars(self.ai_generator.scorer),
+                'spelling': vars(self.spelling),
+                'search_index': vars(self.search_index),
+                'facet_index': vars(self.facet_index),
+                'suggest_index': vars(self.suggest_index),
+                'related_graph': vars(self.related_graph),
+                'quiz_bank': vars(self.quiz_bank),
+                'mcq_shards': vars(self.mcq_shards),
+                'topics_response': vars(self.topics_response),
+                'stats_response': vars(self.stats_response),
+                'file_responses': {name: vars(response) for name, response in self.file_responses.items()},
+                'qa_hashes': self.qa_changes.hashes,
+                'mcq_hashes': self.mcq_changes.hashes,
+                'qa_fragments': self.qa_fragments.projections,
+                'mcq_fragments': self.mcq_fragments.projections,
+                'search_results': list(self.search_fragments.records.values()),
+                'search_fragments': self.search_fragments.projections,
+            }
+        }
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            pickle.dump(snapshot_header(self.scorer_name), f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(body, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+
+def load_dataset(scorer='overlap'):
+    """Load the dataset from a fresh snapshot, falling back to the JSON files"""
+    return Dataset.from_snapshot(scorer=scorer) or Dataset.from_json(scorer)
+
+# Load data and build indexes. Routes read the module-level dataset once per
+# request; reload_dataset replaces it with a fully built one in a single
+# assignment, so a request never sees a mix of old and new indexes.
+dataset = load_dataset(os.environ.get('STUDBOT_SCORER', 'overlap'))
+quiz_sessions = QuizSessionStore()
+reload_lock = threading.Lock()
+# Pid of the pre-fork master (serve.py, gunicorn.conf.py) whose workers
+# share the dataset; it rebuilds the dataset and replaces them on SIGHUP
+reload_master = None
+
+def reload_dataset():
+    """Build a new dataset from the current files and swap it in"""
+    global dataset
+    with reload_lock:
+        new_dataset = load_dataset(dataset.scorer_name)
+        new_dataset.follow(dataset)
+        dataset = new_dataset
+    return new_dataset
+
+def watch_dataset(interval):
+    """Reload the dataset whenever the source files change"""
+    failed_sources = None
+    while True:
+        time.sleep(interval)
+        sources = source_signature()
+        if sources != dataset.sources and sources != failed_sources:
+            try:
+                reload_dataset()
+            except Exception as e:
+                # Keep serving the previous dataset until the files change again
+                failed_sources = sources
+                print("⚠️ Dataset reload failed:", e)
+
+def start_dataset_watcher(interval):
+    """Start watching the dataset files on a daemon thread"""
+    watcher = threading.Thread(target=watch_dataset, args=(interval,), name='dataset-watcher', daemon=True)
+    watcher.start()
+    return watcher
 
 @app.route('/')
 def index():
     """Serve the main page"""
     return render_template('index.html')
 
+# API handlers, shared by the Flask routes below and the ASGI app in asgi.py.
+# Each takes the parsed request and returns a (payload, status) pair.
+def handle_chat(data):
+    """Generate the chat reply for a message"""
+    message = data.get('message', '').strip()
+    
+    if not message:
+        return {'error': 'Message is required'}, 400
+    
+    # Generate AI response
+    current = dataset
+    response, doc_id = current.ai_generator.generate_reply(message)
+    
+    payload = {
+        'response': response,
+        'timestamp': datetime.now().isoformat()
+    }
+    # Opt-in: related questions of the Q&A pair that answered
+    if data.get('related') and doc_id is not None:
+        payload['related'] = current.related_graph.related(doc_id)
+    return payload, 200
+
+def handle_chat_batch(data):
+    """Generate chat replies for a list of messages, in order"""
+    messages = data.get('messages')
+    
+    if not isinstance(messages, list) or not messages:
+        return {'error': 'Messages must be a non-empty list'}, 400
+    
+    if len(messages) > MAX_CHAT_BATCH:
+        return {'error': f'At most {MAX_CHAT_BATCH} messages per batch'}, 400
+    
+    if not all(isinstance(message, str) and message.strip() for message in messages):
+        return {'error': 'Each message must be a non-empty string'}, 400
+    
+    # Generate all responses with a single scoring pass
+    responses = dataset.ai_generator.generate_responses([message.strip() for message in messages])
+    
+    return {
+        'responses': responses,
+        'total': len(responses),
+        'timestamp': datetime.now().isoformat()
+    }, 200
+
+def sse_event(event, data):
+    """Encode one Server-Sent Event with JSON data"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def chat_event_stream(message):
+    """Yield the Server-Sent Events of a streamed chat reply
+    
+    'header' carries the matched question heading (when there is one),
+    'chunk' events carry the rest of the text and 'done' ends the stream.
+    """
+    for event, text in dataset.ai_generator.stream_response(message):
+        yield sse_event(event, text)
+    yield sse_event('done', {'timestamp': datetime.now().isoformat()})
+
+def handle_quiz(difficulty, unit=None, topic=None, fields=None):
+    """Draw a quiz and open a session for it
+    
+    Questions carry only id, question and options unless other QUIZ_FIELDS
+    are requested; correct answers are never sent before submission.
+    """
+    fields, error = parse_fields(fields, QUIZ_FIELDS, QUIZ_DEFAULT_FIELDS)
+    if error:
+        return {'error': error}, 400
+    
+    # Draw 10 questions from the prebuilt bucket
+    current = dataset
+    quiz_questions = current.quiz_bank.sample(difficulty, unit=unit, topic=topic)
+    
+    if not quiz_questions:
+        return {'error': 'No questions found for this difficulty'}, 404
+    
+    session_id = quiz_sessions.create(q.get('id') for q in quiz_questions)
+    
+    return assemble_json({
+        'session_id': session_id,
+        'questions': current.mcq_fragments.fragments(quiz_questions, fields),
+        'total': len(quiz_questions)
+    }), 200
+
+def handle_quiz_session(data):
+    """Open a session for a quiz the client drew from an MCQ shard
+    
+    Shards carry no answers, so a client picks up to QUIZ_SIZE questions
+    from a cached shard and opens a session for their ids here, then grades
+    its answers through /api/quiz/submit like any other quiz.
+    """
+    question_ids = data.get('question_ids')
+    if not isinstance(question_ids, list) or not 0 < len(question_ids) <= QUIZ_SIZE:
+        return {'error': f'question_ids must be a list of 1 to {QUIZ_SIZE} MCQ ids'}, 400
+    
+    by_id = dataset.quiz_bank.by_id
+    if not all(type(question_id) is int and question_id in by_id for question_id in question_ids):
+        return {'error': 'Unknown question ids'}, 400
+    
+    return {'session_id': quiz_sessions.create(question_ids), 'total': len(question_ids)}, 200
+
+def handle_quiz_submit(data):
+    """Grade submitted quiz answers
+    
+    Clients send the session_id issued by /api/quiz/<difficulty> with their
+    answers, either as a list in question order or as a {question_id: answer}
+    object. Posting the full questions array is still accepted. The
+    request is validated before the session is consumed, so a malformed
+    submission can be corrected and sent again.
+    """
+    answers = data.get('answers', [])
+    session_id = data.get('session_id')
+    
+    if not answers or not isinstance(answers, (list, dict)):
+        return {'error': 'Answers must be a non-empty list or object'}, 400
+    
+    if session_id:
+        if not isinstance(session_id, str):
+            return {'error': 'session_id must be a string'}, 400
+        question_ids = quiz_sessions.pop(session_id)
+        if question_ids is None:
+            return {'error': 'Quiz session not found, expired or already submitted'}, 404
+        if isinstance(answers, dict):
+            answers = [answers.get(str(question_id)) for question_id in question_ids]
+        # Questions removed by a dataset reload since the quiz was issued are
+        # skipped, each remaining answer staying with its own question
+        by_id = dataset.quiz_bank.by_id
+        kept = [i for i, question_id in enumerate(question_ids) if question_id in by_id]
+        questions = [by_id[question_ids[i]] for i in kept]
+        answers = [answers[i] if i < len(answers) else None for i in kept]
+    else:
+        questions = data.get('questions', [])
+        if not isinstance(questions, list) or not all(isinstance(question, dict) for question in questions):
+            return {'error': 'questions must be a list of objects'}, 400
+        if isinstance(answers, dict):
+            answers = [answers.get(str(question.get('id'))) for question in questions]
+    
+    if not answers or not questions:
+        return {'error': 'Answers and questions are required'}, 400
+    
+    # Calculate score
+    correct_answers = 0
+    results = []
+    
+    for i, question in enumerate(questions):
+        user_answer = answers[i] if i < len(answers) else None
+        correct_answer = question.get('correct_answer', '')
+        
+        is_correct = user_answer == correct_answer
+        if is_correct:
+            correct_answers += 1
+        
+        results.append({
+            'question_id': question.get('id'),
+            'question': question.get('question'),
+            'user_answer': user_answer,
+            'correct_answer': correct_answer,
+            'is_correct': is_correct,
+            'explanation': question.get('explanation', '')
+        })
+    
+    score_percentage = (correct_answers / len(questions)) * 100
+    
+    return {
+        'score': correct_answers,
+        'total': len(questions),
+        'percentage': round(score_percentage, 2),
+        'results': results
+    }, 200
+
+def handle_search(data, fields=None):
+    """Search the knowledge base for a substring, filtered by category, marks or keyword
+    
+    Results come in corpus order, a page at a time: pass the returned
+    next_cursor back as 'cursor' to get the next page. 'fields' (in the
+    body or as ?fields=) limits the SEARCH_RESULT_FIELDS of each result.
+    """
+    fields, error = parse_fields(data.get('fields', fields), SEARCH_RESULT_FIELDS, SEARCH_RESULT_FIELDS)
+    if error:
+        return {'error': error}, 400
+    
+    query = data.get('query', '')
+    filters = {facet: data[facet] for facet in FacetIndex.facets if data.get(facet) not in (None, '')}
+    if not isinstance(query, str) or any(
+        not isinstance(filters.get(facet, ''), str) for facet in ('category', 'keyword')
+    ):
+        return {'error': 'query, category and keyword must be strings'}, 400
+    query = query.strip()
+    
+    if not query and not filters:
+        return {'error': 'Query is required'}, 400
+    
+    try:
+        if 'marks' in filters:
+            filters['marks'] = int(filters['marks'])
+        limit = min(int(data.get('limit', DEFAULT_SEARCH_LIMIT)), MAX_SEARCH_LIMIT)
+        cursor = int(data['cursor']) if data.get('cursor') is not None else -1
+    except (TypeError, ValueError):
+        return {'error': 'marks, limit and cursor must be integers'}, 400
+    if cursor < -1:
+        return {'error': 'cursor must be a cursor returned by a previous page'}, 400
+    
+    current = dataset
+    
+    # Search through the trigram index
+    corrected = None
+    if query:
+        matches = current.search_index.search(query)
+        
+        # Nothing found: retry once with misspelled words corrected, and
+        # keep the correction only if it finds something
+        if not matches:
+            normalized = normalize_query(query)
+            corrected = current.spelling.correct(normalized)
+            if corrected != normalized:
+                matches = current.search_index.search(corrected)
+            if not matches:
+                corrected = None
+        
+        doc_ids = current.facet_index.filter(filters, matches) if filters else matches
+    else:
+        doc_ids = current.facet_index.filter(filters)
+    
+    # Skip everything up to and including the cursor, then take one page
+    start = bisect.bisect_right(doc_ids, cursor)
+    page = doc_ids[start:start + max(limit, 0)]
+    
+    # Results and their answer snippets were encoded when the dataset loaded
+    results = current.search_fragments.fragments([current.knowledge_base[doc_id] for doc_id in page], fields)
+    
+    payload = {
+        'query': query,
+        'results': results,
+        'total': len(doc_ids),
+        'facets': current.facet_index.counts(doc_ids),
+        'next_cursor': str(page[-1]) if page and start + len(page) < len(doc_ids) else None
+    }
+    if corrected is not None:
+        payload['corrected_query'] = corrected
+    return assemble_json(payload), 200
+
+def handle_related(qa_id):
+    """Get the related questions and MCQs of a Q&A pair"""
+    current = dataset
+    doc_id = current.related_graph.positions.get(qa_id)
+    if doc_id is None:
+        return {'error': 'Question not found'}, 404
+    
+    payload = current.related_graph.related(doc_id)
+    payload['id'] = qa_id
+    return payload, 200
+
+def handle_changes(kind, since):
+    """Get the Q&A pairs or MCQs added, changed and removed since a version"""
+    try:
+        since = int(since) if since not in (None, '') else None
+    except ValueError:
+        return {'error': 'since must be a version number'}, 400
+    
+    current = dataset
+    if kind == 'qa':
+        changes, fragments = current.qa_changes, current.qa_fragments
+    else:
+        changes, fragments = current.mcq_changes, current.mcq_fragments
+    
+    payload = changes.changes(since)
+    payload['added'] = fragments.fragments(payload['added'], None)
+    payload['changed'] = fragments.fragments(payload['changed'], None)
+    return assemble_json(payload), 200
+
+def handle_suggest(query, limit=None):
+    """Complete the user's partial input from questions and keywords"""
+    try:
+        limit = min(int(limit), MAX_SUGGESTIONS) if limit is not None else DEFAULT_SUGGESTIONS
+    except ValueError:
+        return {'error': 'limit must be an integer'}, 400
+    
+    # Keep a trailing space so 'what is ' completes whole words only
+    prefix = normalize_query(query)
+    if prefix and query[-1:].isspace():
+        prefix += ' '
+    
+    return {
+        'query': query,
+        'suggestions': dataset.suggest_index.suggest(prefix, max(limit, 0))
+    }, 200
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
     """Handle chat messages"""
     try:
-        data = request.get_json()
-        message = data.get('message', '').strip()
+        payload, status = handle_chat(request.get_json())
+        return jsonify(payload), status
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/chat/stream', methods=['GET', 'POST'])
+def chat_stream():
+    """Stream a chat reply as Server-Sent Events
+    
+    POST takes the same JSON body as /api/chat; GET takes ?message= so
+    the endpoint also works with the browser EventSource API.
+    """
+    try:
+        if request.method == 'GET':
+            message = request.args.get('message', '').strip()
+        else:
+            message = request.get_json().get('message', '').strip()
         
         if not message:
             return jsonify({'error': 'Message is required'}), 400
         
-        # Generate AI response
-        response = ai_generator.generate_response(message)
-        
-        return jsonify({
-            'response': response,
-            'timestamp': datetime.now().isoformat()
+        return Response(chat_event_stream(message), mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
         })
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/chat/batch', methods=['POST'])
+def chat_batch():
+    """Handle a batch of chat messages"""
+    try:
+        payload, status = handle_chat_batch(request.get_json())
+        return jsonify(payload), status
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/quiz/<difficulty>')
 def get_quiz(difficulty):
-    """Get quiz questions by difficulty"""
+    """Get quiz questions by difficulty, optionally filtered by unit and topic"""
     try:
-        # Filter questions by difficulty
-        filtered_questions = [q for q in mcq_data if q.get('difficulty', 'medium') == difficulty]
-        
-        # Shuffle and limit to 10 questions
-        random.shuffle(filtered_questions)
-        quiz_questions = filtered_questions[:10]
-        
-        if not quiz_questions:
-            return jsonify({'error': 'No questions found for this difficulty'}), 404
-        
-        return jsonify({
-            'questions': quiz_questions,
-            'total': len(quiz_questions)
-        })
+        payload, status = handle_quiz(difficulty, request.args.get('unit'), request.args.get('topic'),
+                                      request.args.get('fields'))
+        return jsonify(payload), status
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/quiz/session', methods=['POST'])
+def open_quiz_session():
+    """Open a quiz session for MCQs drawn from a shard"""
+    try:
+        payload, status = handle_quiz_session(request.get_json())
+        return jsonify(payload), status
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -238,42 +2165,8 @@ def get_quiz(difficulty):
 def submit_quiz():
     """Submit quiz answers and get results"""
     try:
-        data = request.get_json()
-        answers = data.get('answers', [])
-        questions = data.get('questions', [])
-        
-        if not answers or not questions:
-            return jsonify({'error': 'Answers and questions are required'}), 400
-        
-        # Calculate score
-        correct_answers = 0
-        results = []
-        
-        for i, question in enumerate(questions):
-            user_answer = answers[i] if i < len(answers) else None
-            correct_answer = question.get('correct_answer', '')
-            
-            is_correct = user_answer == correct_answer
-            if is_correct:
-                correct_answers += 1
-            
-            results.append({
-                'question_id': question.get('id'),
-                'question': question.get('question'),
-                'user_answer': user_answer,
-                'correct_answer': correct_answer,
-                'is_correct': is_correct,
-                'explanation': question.get('explanation', '')
-            })
-        
-        score_percentage = (correct_answers / len(questions)) * 100
-        
-        return jsonify({
-            'score': correct_answers,
-            'total': len(questions),
-            'percentage': round(score_percentage, 2),
-            'results': results
-        })
+        payload, status = handle_quiz_submit(request.get_json())
+        return jsonify(payload), status
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -282,8 +2175,7 @@ def submit_quiz():
 def get_topics():
     """Get available AI topics"""
     try:
-        topics = list(set([qa.get('category', '') for qa in knowledge_base if qa.get('category')]))
-        return jsonify({'topics': sorted(topics)})
+        return dataset.topics_response.make_response()
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -292,13 +2184,107 @@ def get_topics():
 def get_stats():
     """Get knowledge base statistics"""
     try:
-        stats = {
-            'total_questions': len(knowledge_base),
-            'total_mcqs': len(mcq_data),
-            'categories': len(set([qa.get('category', '') for qa in knowledge_base if qa.get('category')])),
-            'last_updated': datetime.now().isoformat()
-        }
-        return jsonify(stats)
+        return dataset.stats_response.make_response()
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/' + os.path.basename(QA_DATASET_PATH))
+@app.route('/' + os.path.basename(MCQ_DATASET_PATH))
+def get_dataset_file():
+    """Serve a raw dataset file, as fetched by the static frontend"""
+    response = dataset.file_responses.get(request.path.lstrip('/'))
+    if response is None:
+        return jsonify({'error': 'Not found'}), 404
+    return response.make_response()
+
+@app.after_request
+def compress_response(response):
+    """Compress dynamic JSON responses for clients that accept it
+    
+    Precomputed payloads arrive already compressed and are left alone, as
+    are streams, which must reach the client piece by piece.
+    """
+    if (response.status_code != 200 or response.is_streamed or response.direct_passthrough
+            or response.mimetype != 'application/json' or 'Content-Encoding' in response.headers):
+        return response
+    
+    response.vary.add('Accept-Encoding')
+    encoding = request.accept_encodings.best_match(CONTENT_ENCODINGS)
+    body = response.get_data()
+    if encoding is None or len(body) < COMPRESS_MIN_SIZE:
+        return response
+    
+    response.set_data(compress(body, encoding, DYNAMIC_COMPRESSION_LEVELS[encoding]))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+@app.route('/api/mcq/manifest')
+def get_mcq_manifest():
+    """List the MCQ shards with their current content-hashed URLs"""
+    try:
+        return dataset.mcq_shards.manifest.make_response()
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/mcq/shards/<facet>/<name>')
+def get_mcq_shard(facet, name):
+    """Serve one immutable MCQ shard"""
+    try:
+        shard = dataset.mcq_shards.shard(facet, name)
+        if shard is None:
+            return jsonify({'error': 'Shard not found, fetch the manifest for current URLs'}), 404
+        return shard.make_response(IMMUTABLE_CACHE_CONTROL)
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/qa/changes')
+def get_qa_changes():
+    """Get the Q&A pairs added, changed and removed since ?since=<version>"""
+    try:
+        payload, status = handle_changes('qa', request.args.get('since'))
+        return jsonify(payload), status
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/mcq/changes')
+def get_mcq_changes():
+    """Get the MCQs added, changed and removed since ?since=<version>"""
+    try:
+        payload, status = handle_changes('mcq', request.args.get('since'))
+        return jsonify(payload), status
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/stats/cache')
+def get_cache_stats():
+    """Get chat response cache counters"""
+    try:
+        return jsonify(dataset.ai_generator.cache.stats())
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/related/<int:qa_id>')
+def get_related(qa_id):
+    """Get the related questions and MCQs of a Q&A pair"""
+    try:
+        payload, status = handle_related(qa_id)
+        return jsonify(payload), status
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/suggest')
+def suggest():
+    """Autocomplete the chat box input"""
+    try:
+        payload, status = handle_suggest(request.args.get('q', ''), request.args.get('limit'))
+        return jsonify(payload), status
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -307,32 +2293,39 @@ def get_stats():
 def search():
     """Search knowledge base"""
     try:
-        data = request.get_json()
-        query = data.get('query', '').strip()
+        payload, status = handle_search(request.get_json(), request.args.get('fields'))
+        return jsonify(payload), status
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/admin/reload', methods=['POST'])
+def admin_reload():
+    """Reload the datasets from disk without restarting the server
+    
+    Under a pre-fork server the master is asked to reload, replacing every
+    worker, and the request returns before the reload completes.
+    """
+    try:
+        admin_token = os.environ.get('STUDBOT_ADMIN_TOKEN')
+        if not admin_token:
+            return jsonify({'error': 'Reload endpoint is disabled'}), 404
         
-        if not query:
-            return jsonify({'error': 'Query is required'}), 400
+        if not secrets.compare_digest(request.headers.get('X-Admin-Token', ''), admin_token):
+            return jsonify({'error': 'Invalid admin token'}), 403
         
-        # Search through knowledge base
-        results = []
-        query_lower = query.lower()
+        # Reloading one worker of a pre-fork server would leave it with a
+        # private dataset that the other workers never see
+        if reload_master is not None:
+            os.kill(reload_master, signal.SIGHUP)
+            return jsonify({'status': 'reloading'}), 202
         
-        for qa in knowledge_base:
-            if (query_lower in qa.get('question', '').lower() or 
-                query_lower in qa.get('answer', '').lower() or
-                any(query_lower in keyword.lower() for keyword in qa.get('keywords', []))):
-                results.append({
-                    'id': qa.get('id'),
-                    'question': qa.get('question'),
-                    'answer': qa.get('answer')[:200] + '...' if len(qa.get('answer', '')) > 200 else qa.get('answer'),
-                    'category': qa.get('category'),
-                    'keywords': qa.get('keywords', [])
-                })
+        new_dataset = reload_dataset()
         
         return jsonify({
-            'query': query,
-            'results': results[:10],  # Limit to 10 results
-            'total': len(results)
+            'status': 'reloaded',
+            'total_questions': len(new_dataset.knowledge_base),
+            'total_mcqs': len(new_dataset.mcq_data)
         })
     
     except Exception as e:
@@ -348,8 +2341,13 @@ if __name__ == '__main__':
         shutil.copy('index.html', 'templates/index.html')
     
     print("🤖 StudBot Backend Server Starting...")
-    print("📚 Knowledge Base:", len(knowledge_base), "Q&A pairs loaded")
-    print("📝 MCQ Database:", len(mcq_data), "questions loaded")
+    print("📚 Knowledge Base:", len(dataset.knowledge_base), "Q&A pairs loaded")
+    print("📝 MCQ Database:", len(dataset.mcq_data), "questions loaded")
     print("🌐 Server running on http://localhost:5000")
     
+    # Reload the datasets automatically when the JSON files change
+    watch_interval = float(os.environ.get('STUDBOT_WATCH_INTERVAL', '0'))
+    if watch_interval > 0:
+        start_dataset_watcher(watch_interval)
+    
     app.run(debug=True, host='0.0.0.0', port=5000)
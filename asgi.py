@@ -0,0 +1,320 @@
+"""
+StudBot - ASGI serving mode
+Async variant of the chat, quiz, search, topics and stats API. It shares
+the datasets and request handlers of app.py and runs CPU-bound scoring in
+a thread pool, so one process can hold thousands of slow keep-alive
+connections without a thread per connection.
+
+Run it with any ASGI server, for example:
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+"""
+
+import asyncio
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from werkzeug.http import parse_accept_header, parse_etags
+
+import app as studbot
+
+# Scoring holds the GIL, so a few threads are enough to keep it off the event loop
+executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('STUDBOT_ASGI_THREADS', 4)),
+    thread_name_prefix='studbot-scoring'
+)
+
+MAX_BODY_SIZE = 1024 * 1024
+
+CORS_HEADERS = [(b'access-control-allow-origin', b'*')]
+
+class RequestError(Exception):
+    """A client error that is reported with its own status code"""
+    
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+async def read_json(receive):
+    """Read the whole request body and decode it as JSON"""
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            raise RequestError('Client disconnected')
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > MAX_BODY_SIZE:
+            raise RequestError('Request body too large', 413)
+        chunks.append(chunk)
+        if not message.get('more_body', False):
+            break
+    
+    try:
+        data = json.loads(b''.join(chunks))
+    except ValueError:
+        raise RequestError('Request body must be JSON')
+    if not isinstance(data, dict):
+        raise RequestError('Request body must be a JSON object')
+    return data
+
+async def send_body(send, status, body, headers=()):
+    """Send a complete response with CORS headers"""
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-length', str(len(body)).encode('ascii'))] + CORS_HEADERS + list(headers),
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+async def send_json(send, payload, status=200):
+    """Encode a payload the same way the Flask routes do and send it"""
+    if isinstance(payload, studbot.PreencodedJSON):
+        body = payload.body
+    else:
+        body = studbot.app.json.dumps(payload).encode('utf-8')
+    await send_body(send, status, body, [(b'content-type', b'application/json')])
+
+def accept_encodings(request_headers):
+    """Parse the request's Accept-Encoding header"""
+    return parse_accept_header(request_headers.get(b'accept-encoding', b'').decode('latin-1'))
+
+async def send_precomputed(send, precomputed, request_headers, cache_control='no-cache'):
+    """Send a pre-encoded, pre-compressed payload, or 304 if the client already has it"""
+    encoding, body, etag = precomputed.variant(accept_encodings(request_headers))
+    if_none_match = parse_etags(request_headers.get(b'if-none-match', b'').decode('latin-1'))
+    headers = [
+        (b'etag', f'"{etag}"'.encode('ascii')),
+        (b'cache-control', cache_control.encode('ascii')),
+        (b'vary', b'Accept-Encoding'),
+    ]
+    if if_none_match.contains(etag):
+        await send_body(send, 304, b'', headers)
+    else:
+        if encoding:
+            headers.append((b'content-encoding', encoding.encode('ascii')))
+        await send_body(send, 200, body, headers + [(b'content-type', b'application/json')])
+
+def compressing(send, request_headers):
+    """Wrap send so that complete JSON responses are compressed for clients that accept it
+    
+    Mirrors app.compress_response: precomputed payloads are already
+    compressed and streams are passed through untouched.
+    """
+    encoding = accept_encodings(request_headers).best_match(studbot.CONTENT_ENCODINGS)
+    start = None
+    
+    async def wrapped(message):
+        nonlocal start
+        if message['type'] == 'http.response.start':
+            headers = dict(message['headers'])
+            if (message['status'] == 200 and headers.get(b'content-type') == b'application/json'
+                    and b'content-encoding' not in headers):
+                # Hold the start until the body shows whether to compress
+                start = message
+                return
+        elif start is not None:
+            held, start = start, None
+            body = message.get('body', b'')
+            headers = held['headers'] + [(b'vary', b'Accept-Encoding')]
+            if not message.get('more_body', False) and encoding and len(body) >= studbot.COMPRESS_MIN_SIZE:
+                body = studbot.compress(body, encoding, studbot.DYNAMIC_COMPRESSION_LEVELS[encoding])
+                headers = [(name, value) for name, value in headers if name != b'content-length'] + [
+                    (b'content-length', str(len(body)).encode('ascii')),
+                    (b'content-encoding', encoding.encode('ascii')),
+                ]
+                message = dict(message, body=body)
+            await send(dict(held, headers=headers))
+        await send(message)
+    
+    return wrapped
+
+async def in_executor(handler, *args):
+    """Run a CPU-bound handler in the scoring thread pool"""
+    return await asyncio.get_running_loop().run_in_executor(executor, handler, *args)
+
+async def chat(scope, receive, send, match):
+    """Handle chat messages"""
+    payload, status = await in_executor(studbot.handle_chat, await read_json(receive))
+    await send_json(send, payload, status)
+
+async def chat_stream(scope, receive, send, match):
+    """Stream a chat reply as Server-Sent Events"""
+    if scope['method'] == 'GET':
+        query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        message = query.get('message', [''])[0].strip()
+    else:
+        message = (await read_json(receive)).get('message', '').strip()
+    
+    if not message:
+        raise RequestError('Message is required')
+    
+    # Scoring happens in the executor; the pieces are then written one by
+    # one so slow clients start receiving the header immediately
+    events = await in_executor(lambda: list(studbot.chat_event_stream(message)))
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': CORS_HEADERS + [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ],
+    })
+    for event in events:
+        await send({'type': 'http.response.body', 'body': event.encode('utf-8'), 'more_body': True})
+    await send({'type': 'http.response.body', 'body': b''})
+
+async def chat_batch(scope, receive, send, match):
+    """Handle a batch of chat messages"""
+    payload, status = await in_executor(studbot.handle_chat_batch, await read_json(receive))
+    await send_json(send, payload, status)
+
+async def get_quiz(scope, receive, send, match):
+    """Get quiz questions by difficulty, optionally filtered by unit and topic"""
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    unit = query.get('unit', [None])[0]
+    topic = query.get('topic', [None])[0]
+    fields = query.get('fields', [None])[0]
+    # Drawing a quiz is O(k) bucket sampling, cheap enough for the event loop
+    payload, status = studbot.handle_quiz(match.group('difficulty'), unit, topic, fields)
+    await send_json(send, payload, status)
+
+async def open_quiz_session(scope, receive, send, match):
+    """Open a quiz session for MCQs drawn from a shard"""
+    payload, status = studbot.handle_quiz_session(await read_json(receive))
+    await send_json(send, payload, status)
+
+async def submit_quiz(scope, receive, send, match):
+    """Submit quiz answers and get results"""
+    payload, status = studbot.handle_quiz_submit(await read_json(receive))
+    await send_json(send, payload, status)
+
+async def search(scope, receive, send, match):
+    """Search knowledge base"""
+    fields = parse_qs(scope.get('query_string', b'').decode('latin-1')).get('fields', [None])[0]
+    payload, status = await in_executor(studbot.handle_search, await read_json(receive), fields)
+    await send_json(send, payload, status)
+
+async def get_related(scope, receive, send, match):
+    """Get the related questions and MCQs of a Q&A pair"""
+    payload, status = studbot.handle_related(int(match.group('qa_id')))
+    await send_json(send, payload, status)
+
+async def suggest(scope, receive, send, match):
+    """Autocomplete the chat box input"""
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'), keep_blank_values=True)
+    # Binary search over a sorted array, cheap enough for the event loop
+    payload, status = studbot.handle_suggest(query.get('q', [''])[0], query.get('limit', [None])[0])
+    await send_json(send, payload, status)
+
+async def get_topics(scope, receive, send, match):
+    """Get available AI topics"""
+    await send_precomputed(send, studbot.dataset.topics_response, dict(scope['headers']))
+
+async def get_stats(scope, receive, send, match):
+    """Get knowledge base statistics"""
+    await send_precomputed(send, studbot.dataset.stats_response, dict(scope['headers']))
+
+async def get_mcq_manifest(scope, receive, send, match):
+    """List the MCQ shards with their current content-hashed URLs"""
+    await send_precomputed(send, studbot.dataset.mcq_shards.manifest, dict(scope['headers']))
+
+async def get_mcq_shard(scope, receive, send, match):
+    """Serve one immutable MCQ shard"""
+    shard = studbot.dataset.mcq_shards.shard(match.group('facet'), match.group('name'))
+    if shard is None:
+        raise RequestError('Shard not found, fetch the manifest for current URLs', 404)
+    await send_precomputed(send, shard, dict(scope['headers']), studbot.IMMUTABLE_CACHE_CONTROL)
+
+async def get_changes(scope, receive, send, match):
+    """Get the Q&A pairs or MCQs added, changed and removed since ?since=<version>"""
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    payload, status = studbot.handle_changes(match.group('kind'), query.get('since', [None])[0])
+    await send_json(send, payload, status)
+
+async def get_dataset_file(scope, receive, send, match):
+    """Serve a raw dataset file, as fetched by the static frontend"""
+    response = studbot.dataset.file_responses.get(match.group('filename'))
+    if response is None:
+        raise RequestError('Not found', 404)
+    await send_precomputed(send, response, dict(scope['headers']))
+
+async def get_cache_stats(scope, receive, send, match):
+    """Get chat response cache counters"""
+    await send_json(send, studbot.dataset.ai_generator.cache.stats())
+
+ROUTES = [
+    ('POST', re.compile(r'/api/chat'), chat),
+    ('POST', re.compile(r'/api/chat/batch'), chat_batch),
+    ('GET', re.compile(r'/api/chat/stream'), chat_stream),
+    ('POST', re.compile(r'/api/chat/stream'), chat_stream),
+    ('POST', re.compile(r'/api/quiz/session'), open_quiz_session),
+    ('POST', re.compile(r'/api/quiz/submit'), submit_quiz),
+    ('GET', re.compile(r'/api/quiz/(?P<difficulty>[^/]+)'), get_quiz),
+    ('POST', re.compile(r'/api/search'), search),
+    ('GET', re.compile(r'/api/suggest'), suggest),
+    ('GET', re.compile(r'/api/related/(?P<qa_id>\d+)'), get_related),
+    ('GET', re.compile(r'/api/topics'), get_topics),
+    ('GET', re.compile(r'/api/stats'), get_stats),
+    ('GET', re.compile(r'/api/stats/cache'), get_cache_stats),
+    ('GET', re.compile(r'/api/mcq/manifest'), get_mcq_manifest),
+    ('GET', re.compile(r'/api/(?P<kind>qa|mcq)/changes'), get_changes),
+    ('GET', re.compile(r'/api/mcq/shards/(?P<facet>[^/]+)/(?P<name>[^/]+)'), get_mcq_shard),
+    ('GET', re.compile(r'/(?P<filename>[^/]+\.json)'), get_dataset_file),
+]
+
+async def lifespan(receive, send):
+    """Answer the ASGI server's startup and shutdown events"""
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            executor.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def app(scope, receive, send):
+    """ASGI entry point"""
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+    
+    path = scope['path']
+    method = scope['method']
+    send = compressing(send, dict(scope['headers']))
+    
+    allowed = []
+    for route_method, pattern, endpoint in ROUTES:
+        match = pattern.fullmatch(path)
+        if not match:
+            continue
+        if route_method != method:
+            allowed.append(route_method)
+            continue
+        
+        try:
+            await endpoint(scope, receive, send, match)
+        except RequestError as e:
+            await send_json(send, {'error': str(e)}, e.status)
+        except Exception as e:
+            await send_json(send, {'error': str(e)}, 500)
+        return
+    
+    if allowed and method == 'OPTIONS':
+        # CORS preflight
+        request_headers = dict(scope['headers'])
+        await send_body(send, 204, b'', [
+            (b'access-control-allow-methods', ', '.join(allowed + ['OPTIONS']).encode('ascii')),
+            (b'access-control-allow-headers', request_headers.get(b'access-control-request-headers', b'*')),
+        ])
+    elif allowed:
+        await send_json(send, {'error': 'Method not allowed'}, 405)
+    else:
+        await send_json(send, {'error': 'Not found'}, 404)
@@ -0,0 +1,78 @@
+"""
+Benchmark StudBot list response encoding
+Compares encoding records with jsonify on every request against joining
+the per-record JSON fragments pre-encoded when the dataset loads
+"""
+
+import argparse
+import random
+import timeit
+
+import app
+
+def per_request(payload):
+    """Encode a payload from scratch, the way jsonify does"""
+    return app.encode_json(payload)
+
+def cases(dataset):
+    """Yield (name, encode on every request, assemble from fragments) pairs"""
+    quiz = dataset.quiz_bank.sample('hard')
+    lean = [{field: mcq[field] for field in app.QUIZ_DEFAULT_FIELDS if field in mcq} for mcq in quiz]
+    yield (
+        'quiz, 10 lean questions',
+        lambda: per_request({'questions': lean, 'session_id': 'x' * 80, 'total': len(lean)}),
+        lambda: app.assemble_json({
+            'questions': dataset.mcq_fragments.fragments(quiz, app.QUIZ_DEFAULT_FIELDS),
+            'session_id': 'x' * 80,
+            'total': len(quiz)
+        }),
+    )
+
+    page = dataset.knowledge_base[:10]
+    yield (
+        'search, 10 results with snippets',
+        lambda: per_request({'query': 'q', 'results': [
+            {
+                'id': qa.get('id'),
+                'question': qa.get('question'),
+                'answer': qa.get('answer')[:200] + '...' if len(qa.get('answer', '')) > 200 else qa.get('answer'),
+                'category': qa.get('category'),
+                'keywords': qa.get('keywords', [])
+            }
+            for qa in page
+        ], 'total': len(page)}),
+        lambda: app.assemble_json({
+            'query': 'q',
+            'results': dataset.search_fragments.fragments(page, app.SEARCH_RESULT_FIELDS),
+            'total': len(page)
+        }),
+    )
+
+    for kind, records, fragments in (('qa', dataset.knowledge_base, dataset.qa_fragments),
+                                     ('mcq', dataset.mcq_data, dataset.mcq_fragments)):
+        yield (
+            f'{kind} changes, full resync of {len(records)} records',
+            lambda records=records: per_request({'added': records, 'changed': [], 'removed': [], 'version': 1}),
+            lambda records=records, fragments=fragments: app.assemble_json({
+                'added': fragments.fragments(records, None), 'changed': [], 'removed': [], 'version': 1
+            }),
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--number', type=int, default=2000, help='calls per measurement')
+    parser.add_argument('--repeat', type=int, default=5, help='measurements per case, the best is kept')
+    args = parser.parse_args()
+
+    random.seed(0)
+    print(f"📚 {len(app.dataset.knowledge_base)} Q&A pairs, 📝 {len(app.dataset.mcq_data)} MCQs")
+    for name, encode, assemble in cases(app.dataset):
+        timings = [
+            min(timeit.repeat(function, number=args.number, repeat=args.repeat)) / args.number * 1e6
+            for function in (encode, assemble)
+        ]
+        print(f"⏱️ {name}: {timings[0]:.1f} µs encoded per request, "
+              f"{timings[1]:.1f} µs from fragments ({timings[0] / timings[1]:.1f}x)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+"""
+Build the StudBot dataset snapshot
+Loads the JSON datasets, builds every index and writes them to a binary
+snapshot that app.py loads at startup instead of rebuilding
+"""
+
+import argparse
+import os
+import time
+
+import app
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--output', default=app.SNAPSHOT_PATH, help='snapshot file to write')
+    parser.add_argument('--scorer', default=os.environ.get('STUDBOT_SCORER', 'overlap'),
+                        choices=sorted(app.SCORERS), help='chat scorer to prebuild')
+    args = parser.parse_args()
+    
+    start = time.perf_counter()
+    dataset = app.Dataset.from_json(args.scorer)
+    dataset.write_snapshot(args.output)
+    elapsed = time.perf_counter() - start
+    
+    print(f"📦 Snapshot written to {args.output} ({os.path.getsize(args.output)} bytes)")
+    print(f"📚 {len(dataset.knowledge_base)} Q&A pairs, 📝 {len(dataset.mcq_data)} MCQs, scorer: {args.scorer}")
+    print(f"⏱️ Built in {elapsed:.3f}s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+StudBot - Gunicorn configuration
+Preloads the datasets and indexes in the master process and freezes them
+out of the garbage collector before the workers fork, so every worker
+shares those memory pages copy-on-write
+
+    gunicorn -c gunicorn.conf.py app:app
+"""
+
+import os
+import threading
+import time
+
+import serve
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', os.cpu_count() or 1))
+threads = int(os.environ.get('STUDBOT_THREADS', 4))
+preload_app = True
+report_interval = float(os.environ.get('STUDBOT_REPORT_INTERVAL', 60))
+
+def when_ready(server):
+    """Runs in the master after the app is preloaded, before any worker forks"""
+    import app as studbot
+
+    # This file is re-executed on SIGHUP, so state lives on the arbiter
+    server.session_db = serve.configure_sessions(studbot)
+    studbot.reload_master = os.getpid()
+    serve.freeze_shared_state()
+
+    if report_interval > 0:
+        def report():
+            while True:
+                time.sleep(report_interval)
+                serve.report_memory({worker.pid: worker.age for worker in list(server.WORKERS.values())})
+
+        threading.Thread(target=report, daemon=True).start()
+
+def on_reload(server):
+    """SIGHUP: rebuild the datasets in the master so the new workers share them again"""
+    import app as studbot
+
+    try:
+        studbot.reload_dataset()
+    except Exception as e:
+        server.log.error("Dataset reload failed: %s", e)
+    else:
+        server.log.info("Dataset reloaded")
+    serve.freeze_shared_state()
+
+def on_exit(server):
+    if getattr(server, 'session_db', None):
+        os.remove(server.session_db)
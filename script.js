@@ -5,6 +5,9 @@ class StudBot {
     constructor() {
         this.currentQuiz = null;
         this.quizQuestions = [];
+        this.quizBank = [];
+        this.mcqManifest = null;
+        this.quizSessionId = null;
         this.currentQuestionIndex = 0;
         this.score = 0;
         this.userAnswers = [];
@@ -277,13 +280,35 @@ These algorithms are used in pathfinding, puzzle solving, game playing, and many
     }
 
     async loadQuizData() {
+        // When served by the backend, fetch only the small shard manifest
+        // now and each difficulty's shard when its quiz starts
+        this.mcqManifest = await this.fetchManifest();
+        if (!this.mcqManifest) {
+            // No API on static hosting, load the dataset files instead
+            await this.loadQuizFiles();
+        }
+    }
+
+    async fetchManifest() {
+        try {
+            const response = await fetch('api/mcq/manifest');
+            if (response.ok) {
+                return await response.json();
+            }
+        } catch (error) {
+            console.error('Error loading MCQ manifest:', error);
+        }
+        return null;
+    }
+
+    async loadQuizFiles() {
         try {
             // Try to load MCQ data first
             const response = await fetch('ai_mcq_500plus.json');
             const data = await response.json();
-            this.quizQuestions = data.mcqs || [];
+            this.quizBank = data.mcqs || [];
             
-            if (this.quizQuestions.length === 0) {
+            if (this.quizBank.length === 0) {
                 throw new Error('No MCQ data found');
             }
         } catch (error) {
@@ -292,11 +317,11 @@ These algorithms are used in pathfinding, puzzle solving, game playing, and many
                 // Fallback to Q&A data conversion
                 const response = await fetch('ai_qa_dataset.json');
                 const data = await response.json();
-                this.quizQuestions = this.convertToQuizFormat(data.qa_pairs);
+                this.quizBank = this.convertToQuizFormat(data.qa_pairs);
             } catch (qaError) {
                 console.error('Error loading Q&A data:', qaError);
                 // Final fallback
-                this.quizQuestions = this.getFallbackQuizData();
+                this.quizBank = this.getFallbackQuizData();
             }
         }
     }
@@ -398,19 +423,118 @@ These algorithms are used in pathfinding, puzzle solving, game playing, and many
         ];
     }
 
-    startQuiz(difficulty) {
+    async startQuiz(difficulty) {
         this.currentQuiz = difficulty;
         this.currentQuestionIndex = 0;
         this.score = 0;
         this.userAnswers = [];
         
         // Filter questions by difficulty
-        const filteredQuestions = this.quizQuestions.filter(q => q.difficulty === difficulty);
+        const filteredQuestions = await this.loadDifficultyQuestions(difficulty);
         this.quizQuestions = filteredQuestions.slice(0, 10); // Limit to 10 questions
         
+        // Shards carry no answers, so the server grades quizzes drawn from them
+        this.quizSessionId = this.mcqManifest ? await this.openQuizSession(this.quizQuestions) : null;
+        if (this.mcqManifest && !this.quizSessionId) {
+            this.mcqManifest = null;
+            await this.loadQuizFiles();
+            this.quizQuestions = (await this.loadDifficultyQuestions(difficulty)).slice(0, 10);
+        }
+        
         this.showQuizQuestion();
     }
 
+    async openQuizSession(questions) {
+        try {
+            const response = await fetch('api/quiz/session', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ question_ids: questions.map(q => q.id) })
+            });
+            if (response.ok) {
+                const data = await response.json();
+                return data.session_id;
+            }
+        } catch (error) {
+            console.error('Error opening quiz session:', error);
+        }
+        return null;
+    }
+
+    async gradeQuiz() {
+        // Returns the number of correct answers
+        if (this.quizSessionId) {
+            try {
+                const response = await fetch('api/quiz/submit', {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({
+                        session_id: this.quizSessionId,
+                        answers: this.quizQuestions.map((question, index) => this.userAnswers[index] || null)
+                    })
+                });
+                if (response.ok) {
+                    const data = await response.json();
+                    return data.score;
+                }
+            } catch (error) {
+                console.error('Error submitting quiz:', error);
+            }
+            return 0;
+        }
+        
+        let score = 0;
+        this.quizQuestions.forEach((question, index) => {
+            const correctAnswer = question.correct_answer || question.correctAnswer;
+            if (this.userAnswers[index] === correctAnswer) {
+                score++;
+            }
+        });
+        return score;
+    }
+
+    async loadDifficultyQuestions(difficulty) {
+        if (this.mcqManifest) {
+            // A dataset reload changes the shard hashes and retires the old
+            // URLs, so a failed shard is retried once with a fresh manifest
+            let mcqs = await this.fetchShard(difficulty);
+            if (!mcqs) {
+                this.mcqManifest = await this.fetchManifest();
+                mcqs = this.mcqManifest && await this.fetchShard(difficulty);
+            }
+            if (mcqs) {
+                return mcqs;
+            }
+            
+            this.mcqManifest = null;
+            await this.loadQuizFiles();
+        }
+        
+        return this.quizBank.filter(q => q.difficulty === difficulty);
+    }
+
+    async fetchShard(difficulty) {
+        const shard = this.mcqManifest.shards.difficulty[difficulty];
+        if (!shard) {
+            // No questions of this difficulty
+            return [];
+        }
+        
+        try {
+            // Shard URLs carry a content hash, so the browser may cache them for good
+            const response = await fetch(shard.url);
+            if (response.ok) {
+                const data = await response.json();
+                if (Array.isArray(data.mcqs)) {
+                    return data.mcqs;
+                }
+            }
+        } catch (error) {
+            console.error('Error loading MCQ shard:', error);
+        }
+        return null;
+    }
+
     showQuizQuestion() {
         const quizContainer = document.getElementById('quizContainer');
         const question = this.quizQuestions[this.currentQuestionIndex];
@@ -420,9 +544,8 @@ These algorithms are used in pathfinding, puzzle solving, game playing, and many
             return;
         }
 
-        // Handle both old and new question formats
-        const options = question.options || (question.options ? Object.values(question.options) : []);
-        const correctAnswer = question.correct_answer || question.correctAnswer;
+        // Handle both old and new question formats: options as a list or as {A: ..., B: ...}
+        const options = Array.isArray(question.options) ? question.options : Object.values(question.options || {});
         
         const questionHTML = `
             <div class="quiz-question">
@@ -507,17 +630,12 @@ These algorithms are used in pathfinding, puzzle solving, game playing, and many
         }, 1000);
     }
 
-    showQuizResults() {
+    async showQuizResults() {
         clearInterval(this.quizTimer);
         
         // Calculate score
-        this.score = 0;
-        this.quizQuestions.forEach((question, index) => {
-            const correctAnswer = question.correct_answer || question.correctAnswer;
-            if (this.userAnswers[index] === correctAnswer) {
-                this.score++;
-            }
-        });
+        this.score = await this.gradeQuiz();
+        this.quizSessionId = null;
         
         const percentage = Math.round((this.score / this.quizQuestions.length) * 100);
         
@@ -0,0 +1,218 @@
+"""
+StudBot - Pre-fork server
+Loads the datasets and indexes once in a master process, freezes them out
+of the garbage collector and forks worker processes that share those
+memory pages copy-on-write. Workers run werkzeug's development server;
+in production run the same setup under Gunicorn with gunicorn.conf.py
+"""
+
+import argparse
+import gc
+import os
+import secrets
+import signal
+import socket
+import sys
+import tempfile
+import threading
+import time
+import traceback
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Run StudBot with pre-forked worker processes')
+    parser.add_argument('--host', default='0.0.0.0', help='address to listen on')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 5000)), help='port to listen on')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='number of worker processes')
+    parser.add_argument('--backlog', type=int, default=1024, help='listen queue size')
+    parser.add_argument('--report-interval', type=float, default=60,
+                        help='seconds between per-worker memory reports (0 disables)')
+    return parser.parse_args()
+
+def read_memory(pid):
+    """Return RSS, PSS and shared memory of a process in kB (Linux only)"""
+    memory = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                name, _, value = line.partition(':')
+                if name in ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty'):
+                    memory[name] = int(value.split()[0])
+    except OSError:
+        return None
+    return {
+        'rss': memory.get('Rss', 0),
+        'pss': memory.get('Pss', 0),
+        'shared': memory.get('Shared_Clean', 0) + memory.get('Shared_Dirty', 0),
+    }
+
+def report_memory(workers):
+    """Print the memory use of the master and every worker"""
+    pids = [('master', os.getpid())] + [(f'worker {index}', pid) for pid, index in sorted(workers.items(), key=lambda item: item[1])]
+    total_rss = total_pss = 0
+
+    for name, pid in pids:
+        memory = read_memory(pid)
+        if memory is None:
+            continue
+        total_rss += memory['rss']
+        total_pss += memory['pss']
+        print(f"📊 {name} (pid {pid}): RSS {memory['rss'] / 1024:.1f} MB, "
+              f"PSS {memory['pss'] / 1024:.1f} MB, shared {memory['shared'] / 1024:.1f} MB")
+
+    # PSS splits shared pages between the processes using them, so its sum
+    # is the real footprint while the RSS sum counts shared pages N times
+    print(f"📊 total: RSS {total_rss / 1024:.1f} MB, PSS {total_pss / 1024:.1f} MB")
+    sys.stdout.flush()
+
+def run_worker(listener, args, studbot):
+    """Serve requests from the shared listening socket until SIGTERM"""
+    from werkzeug.serving import make_server
+
+    server = make_server(args.host, args.port, studbot.app, threaded=True, fd=listener.fileno())
+
+    def stop(signum, frame):
+        # shutdown() waits for serve_forever to return, so it cannot run in
+        # the signal handler on the serving thread itself
+        threading.Thread(target=server.shutdown).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    server.serve_forever()
+
+    # Give requests that are already being handled time to finish
+    deadline = time.monotonic() + 30
+    for thread in threading.enumerate():
+        if thread is not threading.current_thread():
+            thread.join(max(0, deadline - time.monotonic()))
+
+def spawn_worker(index, listener, args, studbot):
+    """Fork a worker process and return its pid"""
+    pid = os.fork()
+    if pid == 0:
+        status = 0
+        try:
+            run_worker(listener, args, studbot)
+        except BaseException:
+            # os._exit() skips the interpreter's own traceback report
+            traceback.print_exc()
+            status = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(status)
+    return pid
+
+def configure_sessions(studbot):
+    """Switch the app to signed quiz sessions and return the used-nonce file to remove on exit
+
+    Quiz submissions may reach a different worker than the one that issued
+    the quiz, so sessions are signed tokens instead of per-process state,
+    and spent tokens are recorded in a file every worker shares.
+    """
+    secret = os.environ.get('STUDBOT_SESSION_SECRET')
+    path = os.environ.get('STUDBOT_SESSION_DB')
+    created = None
+    if not path:
+        fd, path = tempfile.mkstemp(prefix='studbot-sessions-', suffix='.db')
+        os.close(fd)
+        created = path
+    studbot.quiz_sessions = studbot.SignedQuizSessions(
+        secret.encode('utf-8') if secret else secrets.token_bytes(32), studbot.UsedNonces(path)
+    )
+    return created
+
+def freeze_shared_state():
+    """Move everything loaded so far out of the GC's reach before forking
+
+    Otherwise the collector's reference count and GC header writes in the
+    workers would copy every shared page.
+    """
+    gc.collect()
+    gc.freeze()
+
+def main():
+    args = parse_args()
+
+    listener = socket.create_server((args.host, args.port), backlog=args.backlog)
+    listener.set_inheritable(True)
+
+    # Load datasets and indexes once, before forking
+    import app as studbot
+
+    session_db = configure_sessions(studbot)
+    studbot.reload_master = os.getpid()
+    freeze_shared_state()
+
+    print("🤖 StudBot pre-fork server starting (use gunicorn -c gunicorn.conf.py app:app in production)...")
+    print("📚 Knowledge Base:", len(studbot.dataset.knowledge_base), "Q&A pairs loaded")
+    print("📝 MCQ Database:", len(studbot.dataset.mcq_data), "questions loaded")
+    print(f"🌐 Listening on http://{args.host}:{args.port} with {args.workers} workers")
+    sys.stdout.flush()
+
+    workers = {}
+    for index in range(args.workers):
+        workers[spawn_worker(index, listener, args, studbot)] = index
+
+    stopping = False
+    reloading = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    def reload(signum, frame):
+        nonlocal reloading
+        reloading = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGHUP, reload)
+
+    next_report = time.monotonic() + min(args.report_interval, 5) if args.report_interval > 0 else None
+
+    while not stopping:
+        if reloading:
+            # Rebuild in the master and replace the workers so the new
+            # dataset is shared again instead of rebuilt in every worker
+            reloading = False
+            try:
+                studbot.reload_dataset()
+            except Exception as e:
+                print("⚠️ Dataset reload failed:", e)
+            else:
+                freeze_shared_state()
+                print("🔄 Dataset reloaded, replacing workers")
+                for pid, index in list(workers.items()):
+                    workers[spawn_worker(index, listener, args, studbot)] = index
+                    os.kill(pid, signal.SIGTERM)
+                    del workers[pid]
+
+        # Respawn workers that died
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            pid = 0
+        if pid and pid in workers:
+            index = workers.pop(pid)
+            print(f"⚠️ Worker {index} (pid {pid}) exited with status {status}, respawning")
+            workers[spawn_worker(index, listener, args, studbot)] = index
+        elif pid:
+            continue
+
+        if next_report is not None and time.monotonic() >= next_report:
+            report_memory(workers)
+            next_report = time.monotonic() + args.report_interval
+
+        time.sleep(0.5)
+
+    print("🛑 Stopping workers...")
+    for pid in workers:
+        os.kill(pid, signal.SIGTERM)
+    for pid in workers:
+        os.waitpid(pid, 0)
+    if session_db:
+        os.remove(session_db)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Tests for the delta sync change log
+Checks that changes are merged correctly across several reloads
+"""
+
+import app
+
+def records(*entries):
+    return [app.QARecord({'id': record_id, 'question': question}) for record_id, question in entries]
+
+def reload(previous, *entries):
+    """Build the change log of the next dataset version, continuing previous"""
+    log = app.ChangeLog(records(*entries))
+    log.follow(previous)
+    return log
+
+def ids(payload):
+    """The record ids of a changes payload, per kind"""
+    return (
+        sorted(record['id'] for record in payload['added']),
+        sorted(record['id'] for record in payload['changed']),
+        sorted(payload['removed']),
+    )
+
+def test_changes_merge_across_reloads():
+    v0 = app.ChangeLog(records((1, 'a'), (2, 'b'), (3, 'c')))
+    # Change 2, remove 3 and add 4
+    v1 = reload(v0, (1, 'a'), (2, 'B'), (4, 'd'))
+    # Change 1, add 3 back and remove 4 again
+    v2 = reload(v1, (1, 'A'), (2, 'B'), (3, 'c'))
+    
+    assert v0.version < v1.version < v2.version
+    # 3 existed at v0 and exists again; 4 came and went between v0 and v2
+    assert ids(v2.changes(v0.version)) == ([], [1, 2, 3], [])
+    assert ids(v2.changes(v1.version)) == ([3], [1], [4])
+    assert ids(v2.changes(v2.version)) == ([], [], [])
+    assert v2.changes(v1.version)['changed'][0]['question'] == 'A'
+
+def test_reload_without_changes_keeps_the_version():
+    v0 = app.ChangeLog(records((1, 'a')))
+    v1 = reload(v0, (1, 'a'))
+    assert v1.version == v0.version
+    assert v1.history == []
+
+def test_unknown_or_expired_versions_get_a_full_resync():
+    log = app.ChangeLog(records((1, 'a'), (2, 'b')))
+    first = log.version
+    for step in range(app.MAX_CHANGE_VERSIONS + 1):
+        log = reload(log, (1, f'a{step}'), (2, 'b'))
+    
+    for since in (None, first, log.version + 1):
+        payload = log.changes(since)
+        assert payload['full']
+        assert ids(payload) == ([1, 2], [], [])
+    assert ids(log.changes(log.history[0][0])) == ([], [1], [])
@@ -0,0 +1,121 @@
+"""
+Tests for quiz sessions and grading
+Checks that a session is graded once, in-process and across the workers
+of a pre-fork server, and that answers are graded against the right
+questions
+"""
+
+import json
+
+import pytest
+
+import app
+
+@pytest.fixture
+def sessions(monkeypatch):
+    store = app.QuizSessionStore()
+    monkeypatch.setattr(app, 'quiz_sessions', store)
+    return store
+
+def quiz_ids(count=5):
+    return [mcq['id'] for mcq in app.dataset.mcq_data[:count]]
+
+def correct_answers(question_ids):
+    return [app.dataset.quiz_bank.by_id[question_id]['correct_answer'] for question_id in question_ids]
+
+def test_session_store_pops_once():
+    store = app.QuizSessionStore()
+    session_id = store.create([1, 2, 3])
+    assert store.pop(session_id) == (1, 2, 3)
+    assert store.pop(session_id) is None
+
+def test_session_store_expires_sessions():
+    store = app.QuizSessionStore(ttl=0)
+    assert store.pop(store.create([1])) is None
+
+def test_signed_sessions_are_consumed_once_across_workers(tmp_path):
+    secret = b'secret'
+    path = str(tmp_path / 'sessions.db')
+    # Two workers share the secret and the used-nonce file, not memory
+    worker_a = app.SignedQuizSessions(secret, app.UsedNonces(path))
+    worker_b = app.SignedQuizSessions(secret, app.UsedNonces(path))
+    
+    session_id = worker_a.create([4, 5])
+    assert worker_b.pop(session_id) == (4, 5)
+    assert worker_a.pop(session_id) is None
+    assert worker_b.pop(session_id) is None
+    # Identical quizzes still get distinct sessions
+    assert worker_a.create([4, 5]) != worker_a.create([4, 5])
+
+def test_signed_sessions_reject_forgeries(tmp_path):
+    store = app.SignedQuizSessions(b'secret', app.UsedNonces(str(tmp_path / 'sessions.db')))
+    token, _, signature = store.create([1]).partition('.')
+    assert store.pop(f'{token}.{"0" * len(signature)}') is None
+    assert store.pop(['not', 'a', 'string']) is None
+    other = app.SignedQuizSessions(b'other', app.UsedNonces(str(tmp_path / 'other.db')))
+    assert store.pop(other.create([1])) is None
+
+def test_submit_grades_once(sessions):
+    question_ids = quiz_ids()
+    session_id = sessions.create(question_ids)
+    
+    payload, status = app.handle_quiz_submit({'session_id': session_id, 'answers': correct_answers(question_ids)})
+    assert status == 200
+    assert payload['score'] == payload['total'] == len(question_ids)
+    
+    _, status = app.handle_quiz_submit({'session_id': session_id, 'answers': correct_answers(question_ids)})
+    assert status == 404
+
+def test_submit_accepts_answers_by_id(sessions):
+    question_ids = quiz_ids()
+    session_id = sessions.create(question_ids)
+    answers = {str(question_ids[1]): correct_answers(question_ids)[1]}
+    payload, status = app.handle_quiz_submit({'session_id': session_id, 'answers': answers})
+    assert status == 200
+    assert [result['is_correct'] for result in payload['results']] == [False, True, False, False, False]
+
+@pytest.mark.parametrize('data', [
+    {'answers': []},
+    {'answers': 'A'},
+    {'answers': ['A'], 'session_id': ['not', 'a', 'string']},
+])
+def test_invalid_submissions_keep_the_session(sessions, data):
+    question_ids = quiz_ids()
+    session_id = sessions.create(question_ids)
+    _, status = app.handle_quiz_submit(dict({'session_id': session_id}, **data))
+    assert status == 400
+    
+    _, status = app.handle_quiz_submit({'session_id': session_id, 'answers': correct_answers(question_ids)})
+    assert status == 200
+
+def test_answers_stay_with_their_questions_after_a_reload(sessions, monkeypatch):
+    question_ids = quiz_ids(6)
+    session_id = sessions.create(question_ids)
+    answers = correct_answers(question_ids)
+    # A reload removed the first question of the quiz
+    by_id = dict(app.dataset.quiz_bank.by_id)
+    del by_id[question_ids[0]]
+    monkeypatch.setattr(app.dataset.quiz_bank, 'by_id', by_id)
+    
+    payload, status = app.handle_quiz_submit({'session_id': session_id, 'answers': answers})
+    assert status == 200
+    assert [result['question_id'] for result in payload['results']] == question_ids[1:]
+    assert payload['score'] == payload['total'] == 5
+
+def test_shard_quiz_session(sessions):
+    question_ids = quiz_ids(3)
+    payload, status = app.handle_quiz_session({'question_ids': question_ids})
+    assert status == 200
+    
+    graded, status = app.handle_quiz_submit({'session_id': payload['session_id'], 'answers': correct_answers(question_ids)})
+    assert status == 200
+    assert graded['score'] == 3
+    
+    for question_ids in ([], [10 ** 9], [True], list(range(1, app.QUIZ_SIZE + 2))):
+        assert app.handle_quiz_session({'question_ids': question_ids})[1] == 400
+
+def test_shards_carry_no_answers():
+    for (facet, slug), shard in app.dataset.mcq_shards.shards.items():
+        for mcq in json.loads(shard.body)['mcqs']:
+            assert 'correct_answer' not in mcq
+            assert 'explanation' not in mcq
@@ -0,0 +1,58 @@
+"""
+Tests for the compact dataset records
+Compares their memory footprint with the plain dicts they replace and
+checks that they give back the JSON they were loaded from
+"""
+
+import json
+import tracemalloc
+
+import pytest
+
+import app
+
+DATASETS = [
+    (app.QA_DATASET_PATH, 'qa_pairs', app.QARecord),
+    (app.MCQ_DATASET_PATH, 'mcqs', app.MCQRecord),
+]
+
+def read_entries(path, key):
+    """Return the raw JSON text of a dataset and its parsed entries"""
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    return text, json.loads(text)[key]
+
+def retained_bytes(build):
+    """Bytes still allocated after build() while its result is kept alive"""
+    tracemalloc.start()
+    try:
+        result = build()
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert result
+    return current
+
+@pytest.mark.parametrize('path, key, record_class', DATASETS)
+def test_records_use_less_memory_than_dicts(path, key, record_class):
+    text, _ = read_entries(path, key)
+    dicts = retained_bytes(lambda: json.loads(text)[key])
+    records = retained_bytes(lambda: [record_class(entry) for entry in json.loads(text)[key]])
+    print(f"{record_class.__name__}: {dicts} bytes as dicts, {records} bytes as records")
+    assert records < dicts
+
+@pytest.mark.parametrize('path, key, record_class', DATASETS)
+def test_to_dict_round_trips_json(path, key, record_class):
+    _, entries = read_entries(path, key)
+    for entry in entries:
+        record = record_class(entry)
+        assert record.to_dict() == entry
+        assert json.loads(json.dumps(record.to_dict())) == entry
+
+def test_unknown_fields_are_kept():
+    entry = {'id': 1, 'question': 'What is AI?', 'source': 'notes', 'keywords': ['ai']}
+    record = app.QARecord(entry)
+    assert record['source'] == 'notes'
+    assert 'answer' not in record
+    assert record.get('answer') is None
+    assert record.to_dict() == entry
@@ -0,0 +1,55 @@
+"""
+Tests for the chat retrieval scorers
+Checks that BM25 MaxScore pruning ranks documents exactly like scoring
+every document
+"""
+
+import random
+
+import pytest
+
+import app
+
+def synthetic_corpus(size=400, seed=7):
+    """Q&A pairs of random dataset words, so term frequencies and lengths vary"""
+    rng = random.Random(seed)
+    words = sorted({token for qa in app.dataset.knowledge_base for token in app.tokenize(qa['question'])})
+    return [
+        app.QARecord({'id': doc_id, 'question': ' '.join(rng.choices(words, k=rng.randint(3, 15)))})
+        for doc_id in range(size)
+    ], words
+
+def brute_force(scorer, query, k):
+    """Score every document with every query term and return the top k"""
+    terms = set(app.tokenize(query))
+    scores = {}
+    for doc_id in range(len(scorer.knowledge_base)):
+        score = 0.0
+        for term in terms:
+            tf = scorer.postings.get(term, {}).get(doc_id)
+            if tf:
+                score += scorer.term_score(term, doc_id, tf)
+        if score:
+            scores[doc_id] = score
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+
+@pytest.mark.parametrize('k', [1, 3, 10])
+def test_bm25_top_k_matches_brute_force(k):
+    knowledge_base, words = synthetic_corpus()
+    scorer = app.BM25Scorer(knowledge_base)
+    rng = random.Random(k)
+    queries = [' '.join(rng.sample(words, rng.randint(1, 8))) for _ in range(200)]
+    queries += [qa['question'] for qa in app.dataset.knowledge_base]
+    
+    for query in queries:
+        pruned = scorer.top_k(query, k)
+        expected = brute_force(scorer, query, k)
+        assert [doc_id for doc_id, _ in pruned] == [doc_id for doc_id, _ in expected], query
+        assert [score for _, score in pruned] == pytest.approx([score for _, score in expected])
+
+def test_bm25_best_match_is_normalised():
+    scorer = app.BM25Scorer(app.dataset.knowledge_base)
+    for qa in app.dataset.knowledge_base:
+        _, score = scorer.best_match(qa['question'])
+        assert 0 < score <= 1
+    assert scorer.best_match('zzzz qqqq') == (None, 0)
@@ -0,0 +1,34 @@
+"""
+Tests for the trigram substring index
+Checks that it finds exactly what the linear substring scan it replaced
+found
+"""
+
+import pytest
+
+import app
+
+def linear_scan(knowledge_base, query):
+    """The original search: a case-insensitive substring test of every field"""
+    query_lower = query.lower()
+    return [
+        doc_id for doc_id, qa in enumerate(knowledge_base)
+        if query_lower in qa.get('question', '').lower()
+        or query_lower in qa.get('answer', '').lower()
+        or any(query_lower in keyword.lower() for keyword in qa.get('keywords', []))
+    ]
+
+def sample_queries(knowledge_base):
+    """Short, long, mixed-case, punctuated and missing substrings"""
+    queries = ['a', 'ai', 'AI', 'a*', 'bfs', 'Search', 'search algorithm', 'alpha-beta', '(bfs)', 'zzzz', 'qx', '']
+    for qa in knowledge_base[::4]:
+        answer = qa.get('answer', '')
+        queries += [qa['question'][5:25], answer[40:47].upper(), answer[100:102]]
+        queries += [keyword[1:] for keyword in qa.get('keywords', [])[:2]]
+    return queries
+
+INDEX = app.TrigramIndex(app.dataset.knowledge_base)
+
+@pytest.mark.parametrize('query', sample_queries(app.dataset.knowledge_base))
+def test_trigram_search_matches_linear_scan(query):
+    assert INDEX.search(query) == linear_scan(app.dataset.knowledge_base, query)